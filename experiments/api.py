@@ -1,14 +1,42 @@
-from rest_framework import serializers, permissions, viewsets
-
-from experiments import appclasses
+from collections import Counter, OrderedDict
+
+from django import forms
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import serializers, permissions, viewsets, mixins, \
+    status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from experiments import appclasses, jobs, uploads
+from experiments.bulk import BulkCreateMixin, is_unique, related_ids, \
+    get_related
+from experiments.caching import CachedResponseMixin
+from experiments.fieldsets import DynamicFieldsMixin, \
+    DynamicFieldsSerializerMixin
+from experiments.downloads import IgnoreClientContentNegotiation, \
+    serve_file
+from experiments.filtering import Filter, FlagFilter, BooleanField
+from experiments.instrumentation import SerializerTimingMixin
 from experiments.models import Experiment, Study, User, Researcher, \
-    ProtocolComponent, Group
+    ProtocolComponent, Group, ExperimentStatus, ChunkedUpload, Job
+from experiments.pagination import PaginationModeMixin
+from experiments.prefetching import optimize_queryset
+from experiments.search import search
+from experiments.streaming import StreamingListMixin
+from experiments.values import ValuesListMixin
+from experiments.versioning import RevisionMixin
 
 
 ###################
 # API Serializers #
 ###################
-class ExperimentSerializer(serializers.ModelSerializer):
+class ExperimentSerializer(DynamicFieldsSerializerMixin,
+                           SerializerTimingMixin,
+                           serializers.ModelSerializer):
     study = serializers.ReadOnlyField(source='study.title')
     owner = serializers.ReadOnlyField(source='owner.username')
     status = serializers.ReadOnlyField(source='status.tag')
@@ -22,6 +50,14 @@ class ExperimentSerializer(serializers.ModelSerializer):
                   'nes_id', 'ethics_committee_file', 'study',
                   'owner', 'status', 'protocol_components')
 
+    def get_expandable_fields(self):
+        return {
+            'study': StudySerializer(read_only=True),
+            'protocol_components': ProtocolComponentSerializer(
+                many=True, read_only=True
+            ),
+        }
+
 
 class UserSerializer(serializers.ModelSerializer):
     experiments = serializers.PrimaryKeyRelatedField(
@@ -33,7 +69,9 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'experiments')
 
 
-class StudySerializer(serializers.ModelSerializer):
+class StudySerializer(DynamicFieldsSerializerMixin,
+                      SerializerTimingMixin,
+                      serializers.ModelSerializer):
     researcher = serializers.ReadOnlyField(source='researcher.first_name')
     owner = serializers.ReadOnlyField(source='owner.username')
     experiments = serializers.PrimaryKeyRelatedField(
@@ -45,8 +83,16 @@ class StudySerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'description', 'start_date', 'end_date',
                   'nes_id', 'researcher', 'owner', 'experiments')
 
+    def get_expandable_fields(self):
+        return {
+            'researcher': ResearcherSerializer(read_only=True),
+            'experiments': ExperimentSerializer(many=True, read_only=True),
+        }
+
 
-class ResearcherSerializer(serializers.ModelSerializer):
+class ResearcherSerializer(DynamicFieldsSerializerMixin,
+                           SerializerTimingMixin,
+                           serializers.ModelSerializer):
     studies = serializers.PrimaryKeyRelatedField(
         many=True, read_only=True
     )
@@ -57,8 +103,15 @@ class ResearcherSerializer(serializers.ModelSerializer):
         fields = ('id', 'first_name', 'surname', 'email', 'studies',
                   'nes_id', 'owner')
 
+    def get_expandable_fields(self):
+        return {
+            'studies': StudySerializer(many=True, read_only=True),
+        }
 
-class ProtocolComponentSerializer(serializers.ModelSerializer):
+
+class ProtocolComponentSerializer(DynamicFieldsSerializerMixin,
+                                  SerializerTimingMixin,
+                                  serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     experiment = serializers.ReadOnlyField(source='experiment.title')
 
@@ -67,8 +120,15 @@ class ProtocolComponentSerializer(serializers.ModelSerializer):
         fields = ('id', 'identification', 'description', 'duration_value',
                   'component_type', 'nes_id', 'experiment', 'owner')
 
+    def get_expandable_fields(self):
+        return {
+            'experiment': ExperimentSerializer(read_only=True),
+        }
+
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(DynamicFieldsSerializerMixin,
+                      SerializerTimingMixin,
+                      serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     experiment = serializers.ReadOnlyField(source='experiment.title')
 
@@ -77,12 +137,113 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'description', 'experiment', 'nes_id',
                   'owner')
 
+    def get_expandable_fields(self):
+        return {
+            'experiment': ExperimentSerializer(read_only=True),
+        }
+
+
+class ExperimentTreeSerializer(serializers.ModelSerializer):
+    """
+    Experiment version with its protocol components and groups, as nested
+    in experiment trees (see ExperimentViewSet.tree).
+    """
+    owner = serializers.ReadOnlyField(source='owner.username')
+    status = serializers.ReadOnlyField(source='status.tag')
+    protocol_components = ProtocolComponentSerializer(
+        many=True, read_only=True,
+        fields=('id', 'identification', 'description', 'duration_value',
+                'component_type', 'nes_id')
+    )
+    groups = GroupSerializer(many=True, read_only=True,
+                             fields=('id', 'title', 'description', 'nes_id'))
+
+    class Meta:
+        model = Experiment
+        fields = ('id', 'title', 'description', 'data_acquisition_done',
+                  'nes_id', 'version', 'ethics_committee_file', 'owner',
+                  'status', 'protocol_components', 'groups')
+
+
+# Fields of researchers and studies in experiment trees, where their
+# children are nested
+RESEARCHER_TREE_FIELDS = ('id', 'first_name', 'surname', 'email', 'nes_id',
+                          'owner')
+STUDY_TREE_FIELDS = ('id', 'title', 'description', 'start_date', 'end_date',
+                     'nes_id', 'owner')
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    experiment = serializers.IntegerField(
+        source='experiment.nes_id',
+        help_text='nes_id of the experiment, whose current version gets '
+                  'the file'
+    )
+    size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('id', 'experiment', 'filename', 'size', 'offset',
+                  'created_at', 'completed_at')
+        read_only_fields = ('offset', 'created_at', 'completed_at')
+
+    def validate_size(self, size):
+        if size > settings.NEP_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                'Uploads are limited to %d bytes.' %
+                settings.NEP_UPLOAD_MAX_SIZE
+            )
+        return size
+
+
+class FinalizeUploadSerializer(serializers.Serializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'max_attempts',
+                  'run_after', 'last_error', 'created_at', 'started_at',
+                  'finished_at')
+
+
+class ExperimentFileQuerySerializer(serializers.Serializer):
+    version = serializers.IntegerField(required=False, min_value=1)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, default='')
+    limit = serializers.IntegerField(required=False, default=20,
+                                     min_value=1, max_value=100)
+
 
 #############
 # API Views #
 #############
-class ResearcherViewSet(viewsets.ModelViewSet):
+# List filters (see experiments.filtering.FieldFilterBackend)
+owner_filter = Filter('owner__username', description='Owner username')
+experiment_filter = Filter('experiment__nes_id', forms.IntegerField(),
+                           'Experiment nes_id')
+experiment_current_filter = FlagFilter(
+    'experiment__is_current',
+    'Only rows of current experiment versions, if true'
+)
+
+
+class ResearcherViewSet(CachedResponseMixin, RevisionMixin,
+                        BulkCreateMixin, DynamicFieldsMixin,
+                        ValuesListMixin, StreamingListMixin,
+                        PaginationModeMixin, viewsets.ModelViewSet):
     lookup_field = 'nes_id'
+    cache_models = (Researcher, Study, Experiment, User)
+    pagination_mode = 'page'
+    filter_fields = {
+        'owner': owner_filter,
+    }
+    ordering_fields = ('id', 'nes_id', 'first_name', 'surname', 'updated_at')
+    ordering = ('id',)
     queryset = Researcher.objects.all()
     serializer_class = ResearcherSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
@@ -91,16 +252,43 @@ class ResearcherViewSet(viewsets.ModelViewSet):
         # TODO: don't filter by owner if not logged (gets TypeError
         # exception when trying to get an individual researcher
         if 'nes_id' in self.kwargs:
-            return Researcher.objects.filter(owner=self.request.user)
+            queryset = Researcher.objects.filter(owner=self.request.user)
         else:
-            return Researcher.objects.all()
+            queryset = Researcher.objects.all()
+        return optimize_queryset(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-
-class StudyViewSet(viewsets.ModelViewSet):
+    def get_bulk_objects(self, items, errors):
+        owner = self.request.user
+        seen_nes_ids = set(Researcher.objects.filter(
+            owner=owner,
+            nes_id__in={item.validated_data['nes_id'] for item in items}
+        ).values_list('nes_id', flat=True))
+        return [
+            Researcher(owner=owner, **item.validated_data) for item in items
+            if is_unique(errors, item, item.validated_data['nes_id'],
+                         seen_nes_ids, ('nes_id', 'owner'))
+        ]
+
+
+class StudyViewSet(CachedResponseMixin, RevisionMixin,
+                   BulkCreateMixin, DynamicFieldsMixin,
+                   ValuesListMixin, StreamingListMixin,
+                   PaginationModeMixin, viewsets.ModelViewSet):
     lookup_field = 'nes_id'
+    cache_models = (Study, Researcher, Experiment, ExperimentStatus,
+                    ProtocolComponent, User)
+    pagination_mode = 'page'
+    filter_fields = {
+        'owner': owner_filter,
+        'researcher': Filter('researcher__nes_id', forms.IntegerField(),
+                             'Researcher nes_id'),
+    }
+    ordering_fields = ('id', 'nes_id', 'title', 'start_date', 'end_date',
+                       'updated_at')
+    ordering = ('id',)
     serializer_class = StudySerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
@@ -108,9 +296,10 @@ class StudyViewSet(viewsets.ModelViewSet):
         # TODO: don't filter by owner if not logged (gets TypeError)
         # exception when trying to get an individual study
         if 'nes_id' in self.kwargs:
-            return Study.objects.filter(owner=self.request.user)
+            queryset = Study.objects.filter(owner=self.request.user)
         else:
-            return Study.objects.all()
+            queryset = Study.objects.all()
+        return optimize_queryset(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
         # TODO: breaks when posting from the api template.
@@ -119,9 +308,48 @@ class StudyViewSet(viewsets.ModelViewSet):
         researcher = Researcher.objects.get(id=researcher_id)
         serializer.save(researcher=researcher, owner=self.request.user)
 
-
-class ExperimentViewSet(viewsets.ModelViewSet):
+    def get_bulk_objects(self, items, errors):
+        owner = self.request.user
+        researchers = Researcher.objects.in_bulk(
+            related_ids(items, 'researcher')
+        )
+        seen_nes_ids = set(Study.objects.filter(
+            owner=owner,
+            nes_id__in={item.validated_data['nes_id'] for item in items}
+        ).values_list('nes_id', flat=True))
+        studies = []
+        for item in items:
+            researcher = get_related(errors, item, 'researcher', researchers)
+            if researcher and is_unique(
+                    errors, item, item.validated_data['nes_id'],
+                    seen_nes_ids, ('nes_id', 'owner')):
+                studies.append(Study(researcher=researcher, owner=owner,
+                                     **item.validated_data))
+        return studies
+
+
+class ExperimentViewSet(CachedResponseMixin, RevisionMixin,
+                        BulkCreateMixin, DynamicFieldsMixin,
+                        ValuesListMixin, StreamingListMixin,
+                        PaginationModeMixin, viewsets.ModelViewSet):
     lookup_field = 'nes_id'
+    cache_models = (Experiment, Study, Researcher, ExperimentStatus,
+                    ProtocolComponent, Group, User)
+    filter_fields = {
+        'owner': owner_filter,
+        'status': Filter('status__tag', description='Status tag'),
+        'study': Filter('study__nes_id', forms.IntegerField(),
+                        'Study nes_id'),
+        'data_acquisition_done': Filter('data_acquisition_done',
+                                        BooleanField()),
+        'nes_id': Filter('nes_id', forms.IntegerField()),
+        'version': Filter('version', forms.IntegerField()),
+        'current_only': FlagFilter('is_current',
+                                   'Only current experiment versions, if '
+                                   'true'),
+    }
+    ordering_fields = ('id', 'nes_id', 'version', 'title', 'updated_at')
+    ordering = ('id',)
     serializer_class = ExperimentSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
@@ -129,25 +357,100 @@ class ExperimentViewSet(viewsets.ModelViewSet):
         # TODO: don't filter by owner if not logged (gets TypeError)
         # exception when trying to get an individual experiment
         if 'nes_id' in self.kwargs:
-            return Experiment.objects.filter(owner=self.request.user)
+            queryset = Experiment.objects.filter(owner=self.request.user)
         else:
-            return Experiment.objects.all()
+            queryset = Experiment.objects.all()
+        # status defaults to an id that may not exist (see Experiment.status):
+        # an inner join would drop those experiments
+        return optimize_queryset(queryset, self.get_serializer(),
+                                 prefetch=('status',))
 
     def perform_create(self, serializer):
         # TODO: wrong! Get study by self.kwargs not request data
         study_id = self.request.data['study']
         study = Study.objects.get(id=study_id)
-        nes_id = self.request.data['nes_id']
+        nes_id = serializer.validated_data['nes_id']
         owner = self.request.user
         exp_version = appclasses.ExperimentVersion(nes_id, owner)
-        serializer.save(
-            study=study, owner=owner,
-            version=exp_version.get_last_version() + 1
+        # Version allocation and Experiment.save, that demotes the previous
+        # current version, run in the same transaction
+        exp_version.save_new_version(
+            lambda version: serializer.save(study=study, owner=owner,
+                                            version=version)
+        )
+        enqueue_file_checks(serializer.instance, owner)
+
+    def perform_update(self, serializer):
+        experiment = serializer.save()
+        if 'ethics_committee_file' in serializer.validated_data:
+            enqueue_file_checks(experiment, self.request.user)
+
+    @action(detail=True)
+    def tree(self, request, nes_id=None):
+        """
+        Returns all versions of an experiment, with their protocol
+        components and groups, nested under their studies and researchers.
+        The tree is built from a fixed number of queries, whatever its
+        size. Experiments are those of the owner with username given by
+        ?owner, or of the logged user.
+        """
+        versions = owner_experiments(request)
+        versions = optimize_queryset(
+            versions.filter(nes_id=nes_id).select_related(
+                'study__researcher__owner', 'study__owner'
+            ).order_by('version'),
+            ExperimentTreeSerializer(), prefetch=('status',)
         )
+        researchers = build_experiment_tree(versions)
+        if not researchers:
+            raise Http404
+        return Response({'researchers': researchers})
 
+    def run_bulk_create(self, create):
+        return appclasses.run_allocating_versions(create, self.request.user)
 
-class ProtocolComponentViewSet(viewsets.ModelViewSet):
+    def get_bulk_objects(self, items, errors):
+        owner = self.request.user
+        studies = Study.objects.in_bulk(related_ids(items, 'study'))
+        experiments, current_experiments = [], {}
+        for item in items:
+            study = get_related(errors, item, 'study', studies)
+            if study:
+                experiment = Experiment(study=study, owner=owner,
+                                        **item.validated_data)
+                experiments.append(experiment)
+                current_experiments[experiment.nes_id] = experiment
+        versions = appclasses.allocate_versions(owner, Counter(
+            experiment.nes_id for experiment in experiments
+        ))
+        for experiment in experiments:
+            experiment.version = versions[experiment.nes_id]
+            versions[experiment.nes_id] += 1
+        # bulk_create bypasses Experiment.save, that maintains is_current
+        Experiment.objects.current().filter(
+            owner=owner, nes_id__in=current_experiments
+        ).update(is_current=False, updated_at=timezone.now())
+        for experiment in current_experiments.values():
+            experiment.is_current = True
+        return experiments
+
+
+class ProtocolComponentViewSet(CachedResponseMixin, RevisionMixin,
+                               BulkCreateMixin, DynamicFieldsMixin,
+                               ValuesListMixin, StreamingListMixin,
+                               PaginationModeMixin, viewsets.ModelViewSet):
     lookup_field = 'nes_id'
+    cache_models = (ProtocolComponent, Experiment, Study, ExperimentStatus,
+                    User)
+    filter_fields = {
+        'owner': owner_filter,
+        'experiment': experiment_filter,
+        'component_type': Filter('component_type'),
+        'current_only': experiment_current_filter,
+    }
+    ordering_fields = ('id', 'nes_id', 'identification', 'component_type',
+                       'duration_value', 'updated_at')
+    ordering = ('id',)
     serializer_class = ProtocolComponentSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
@@ -155,9 +458,12 @@ class ProtocolComponentViewSet(viewsets.ModelViewSet):
         # TODO: don't filter by owner if not logged (gets TypeError)
         # exception when trying to get an individual experiment
         if 'nes_id' in self.kwargs:
-            return ProtocolComponent.objects.filter(owner=self.request.user)
+            queryset = ProtocolComponent.objects.filter(
+                owner=self.request.user
+            )
         else:
-            return ProtocolComponent.objects.all()
+            queryset = ProtocolComponent.objects.all()
+        return optimize_queryset(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
         # TODO: we must create protocol_component for the last experiment
@@ -175,13 +481,49 @@ class ProtocolComponentViewSet(viewsets.ModelViewSet):
         ).get()
         serializer.save()
 
-
-class GroupViewSet(viewsets.ModelViewSet):
+    def get_bulk_objects(self, items, errors):
+        owner = self.request.user
+        experiments = current_experiments_by_nes_id(
+            owner, related_ids(items, 'experiment')
+        )
+        seen_keys = set(ProtocolComponent.objects.filter(
+            owner=owner, experiment__in=experiments.values()
+        ).values_list('nes_id', 'experiment_id'))
+        protocol_components = []
+        for item in items:
+            experiment = get_related(errors, item, 'experiment', experiments)
+            if experiment and is_unique(
+                    errors, item,
+                    (item.validated_data['nes_id'], experiment.id),
+                    seen_keys, ('nes_id', 'owner', 'experiment')):
+                protocol_components.append(ProtocolComponent(
+                    experiment=experiment, owner=owner, **item.validated_data
+                ))
+        return protocol_components
+
+
+class GroupViewSet(CachedResponseMixin, RevisionMixin,
+                   BulkCreateMixin, DynamicFieldsMixin,
+                   ValuesListMixin, StreamingListMixin,
+                   PaginationModeMixin, viewsets.ModelViewSet):
     lookup_field = 'nes_id'
+    cache_models = (Group, Experiment, Study, ExperimentStatus,
+                    ProtocolComponent, User)
+    filter_fields = {
+        'owner': owner_filter,
+        'experiment': experiment_filter,
+        'current_only': experiment_current_filter,
+    }
+    ordering_fields = ('id', 'nes_id', 'title', 'updated_at')
+    ordering = ('id',)
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
+    def get_queryset(self):
+        return optimize_queryset(super().get_queryset(),
+                                 self.get_serializer())
+
     # def get_queryset(self):
     #     # TODO: don't filter by owner if not logged (gets TypeError)
     #     # exception when trying to get an individual experiment
@@ -193,12 +535,231 @@ class GroupViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         exp_nes_id = self.request.data['experiment']
         owner = self.request.user
-        last_version = appclasses.ExperimentVersion(
+        # TODO: if there's no current experiment generates exception: "no
+        # experiment was created yet"
+        experiment = appclasses.ExperimentVersion(
             exp_nes_id, owner
-        ).get_last_version()
-        # TODO: if last_version == 0 generates exception: "no experiment was
-        # created yet"
-        experiment = Experiment.objects.get(
-            nes_id=exp_nes_id, owner=owner, version=last_version
-        )
+        ).get_current_experiment()
         serializer.save(experiment=experiment, owner=owner)
+
+    def get_bulk_objects(self, items, errors):
+        owner = self.request.user
+        # Items without experiment go to the experiment of the url
+        items = [
+            item if 'experiment' in item.data else item._replace(
+                data=dict(item.data, experiment=self.kwargs['nes_id'])
+            ) for item in items
+        ]
+        experiments = current_experiments_by_nes_id(
+            owner, related_ids(items, 'experiment')
+        )
+        seen_keys = set(Group.objects.filter(
+            owner=owner, experiment__in=experiments.values()
+        ).values_list('nes_id', 'experiment_id'))
+        groups = []
+        for item in items:
+            experiment = get_related(errors, item, 'experiment', experiments)
+            if experiment and is_unique(
+                    errors, item,
+                    (item.validated_data['nes_id'], experiment.id),
+                    seen_keys, ('nes_id', 'owner', 'experiment')):
+                groups.append(Group(experiment=experiment, owner=owner,
+                                    **item.validated_data))
+        return groups
+
+
+class SearchView(CachedResponseMixin, APIView):
+    """
+    Searches experiments, studies and protocol components by words in
+    their titles or descriptions, best matches first. The last word
+    matches as a prefix.
+    """
+    cache_models = (Experiment, Study, ProtocolComponent)
+
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response({
+            'results': search(query.validated_data['q'],
+                              query.validated_data['limit'])
+        })
+
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Uploads experiments' ethics committee files in chunks:
+    - POST with experiment nes_id, filename and size starts an upload;
+    - PUT <upload url>/chunk/ with a Content-Range header, like
+      "bytes <first>-<last>/<upload size>", and the chunk bytes as body
+      appends a chunk. Chunks must start at the upload offset: after
+      failures, GET the upload to resume from its offset;
+    - POST <upload url>/finalize/ with the file sha256 checksum attaches
+      the file to the current experiment version.
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = None
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        owner = self.request.user
+        nes_id = serializer.validated_data.pop('experiment')['nes_id']
+        experiment = current_experiments_by_nes_id(owner, [nes_id]).get(
+            nes_id
+        )
+        if experiment is None:
+            raise ValidationError({'experiment': ['Experiment not found.']})
+        upload = serializer.save(experiment=experiment, owner=owner)
+        uploads.create_partial_file(upload)
+
+    def perform_destroy(self, instance):
+        uploads.delete_upload(instance)
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            start, length = uploads.parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'), upload.size
+            )
+            uploads.append_chunk(upload, request.stream, start, length)
+        except uploads.UploadError as error:
+            return self.upload_error_response(upload, error)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        upload = self.get_object()
+        serializer = FinalizeUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            uploads.finalize(upload, serializer.validated_data['sha256'])
+        except uploads.UploadError as error:
+            return self.upload_error_response(upload, error)
+        enqueue_file_checks(upload.experiment, request.user)
+        return Response(self.get_serializer(upload).data)
+
+    def upload_error_response(self, upload, error):
+        return Response(
+            {'detail': str(error), 'offset': upload.offset},
+            status=status.HTTP_409_CONFLICT if error.conflict
+            else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background jobs queued by the requests of the logged user, like the
+    checks of uploaded files, with their status.
+    """
+    filter_fields = {
+        'status': Filter('status', forms.ChoiceField(
+            choices=Job.STATUS_CHOICES
+        ), 'Job status'),
+        'name': Filter('name', description='Task name'),
+    }
+    ordering_fields = ('id', 'created_at', 'updated_at')
+    ordering = ('id',)
+    serializer_class = JobSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user)
+
+
+class ExperimentFileView(APIView):
+    """
+    Downloads the ethics committee file of an experiment version: the
+    current one, or the one given by ?version. Experiments are those of the
+    owner with username given by ?owner, or of the logged user. Supports
+    conditional and range requests (see experiments.downloads).
+    """
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, nes_id):
+        query = ExperimentFileQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        experiments = owner_experiments(request).filter(nes_id=nes_id)
+        if 'version' in query.validated_data:
+            experiments = experiments.filter(
+                version=query.validated_data['version']
+            )
+        else:
+            experiments = experiments.current()
+        experiment = experiments.only(
+            'ethics_committee_file', 'ethics_committee_file_name'
+        ).first()
+        if experiment is None or not experiment.ethics_committee_file:
+            raise Http404
+        file = experiment.ethics_committee_file
+        return serve_file(request, file.storage, file.name,
+                          experiment.ethics_committee_file_name)
+
+
+def owner_experiments(request):
+    """
+    :return: experiments of the owner with username given by ?owner, or of
+    the logged user
+    """
+    if 'owner' in request.query_params:
+        return Experiment.objects.filter(
+            owner__username=request.query_params['owner']
+        )
+    if request.user.is_authenticated:
+        return Experiment.objects.filter(owner=request.user)
+    raise ValidationError({'owner': ['This field is required.']})
+
+
+def build_experiment_tree(versions):
+    """
+    Nests serialized experiment versions under their studies, and studies
+    under their researchers.
+    :param versions: experiments, with studies and researchers selected
+    :return: list of serialized researchers
+    """
+    researchers, studies = OrderedDict(), {}
+    for experiment in versions:
+        study = experiment.study
+        if study.id not in studies:
+            researcher = study.researcher
+            if researcher.id not in researchers:
+                researchers[researcher.id] = dict(
+                    ResearcherSerializer(researcher,
+                                         fields=RESEARCHER_TREE_FIELDS).data,
+                    studies=[]
+                )
+            studies[study.id] = dict(
+                StudySerializer(study, fields=STUDY_TREE_FIELDS).data,
+                experiments=[]
+            )
+            researchers[researcher.id]['studies'].append(studies[study.id])
+        studies[study.id]['experiments'].append(
+            ExperimentTreeSerializer(experiment).data
+        )
+    return list(researchers.values())
+
+
+def current_experiments_by_nes_id(owner, nes_ids):
+    return {
+        experiment.nes_id: experiment
+        for experiment in Experiment.objects.current().filter(
+            owner=owner, nes_id__in=nes_ids
+        )
+    }
+
+
+def enqueue_file_checks(experiment, owner):
+    """
+    Queues the checks of the ethics committee file of experiment, run in
+    background by the run_jobs management command instead of in the
+    request (see experiments.tasks).
+    """
+    if experiment.ethics_committee_file:
+        jobs.enqueue('check_ethics_committee_file', owner=owner,
+                     experiment_id=experiment.id)
@@ -13,11 +13,17 @@ router.register(r'experiments', api.ExperimentViewSet,
                 base_name='api_experiments')
 router.register(r'protocol_components', api.ProtocolComponentViewSet,
                 base_name='api_protocol_components')
+router.register(r'uploads', api.ChunkedUploadViewSet,
+                base_name='api_uploads')
+router.register(r'jobs', api.JobViewSet, base_name='api_jobs')
 
 api_groups_list = api.GroupViewSet.as_view({
     'get': 'list',
     'post': 'create',
 })
+api_groups_bulk = api.GroupViewSet.as_view({
+    'post': 'bulk',
+})
 # Get rest framework schema view
 schema_view = get_schema_view(title='NEP API')
 
@@ -25,5 +31,10 @@ urlpatterns = [
     url(r'^schema/$', schema_view),
     url(r'^', include(router.urls)),
     url(r'^experiments/(?P<nes_id>[0-9]+)/groups/$', api_groups_list,
-        name='api_groups-list')
+        name='api_groups-list'),
+    url(r'^experiments/(?P<nes_id>[0-9]+)/groups/bulk/$', api_groups_bulk,
+        name='api_groups-bulk'),
+    url(r'^experiments/(?P<nes_id>[0-9]+)/file/$',
+        api.ExperimentFileView.as_view(), name='api_experiments-file'),
+    url(r'^search/$', api.SearchView.as_view(), name='api_search'),
 ]
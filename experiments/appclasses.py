@@ -1,6 +1,11 @@
-from django.db.models import Max
+from collections import defaultdict
+
+from django.db import transaction, IntegrityError
+from django.db.models import Exists, OuterRef, F, Max
+from django.utils import timezone
 
 from experiments import models
+from experiments.caching import invalidate
 
 
 class ExperimentVersion:
@@ -11,10 +16,146 @@ class ExperimentVersion:
 
     def get_last_version(self):
         last_exp_version = models.Experiment.objects.filter(
-            nes_id=self.nes_id, owner=self.owner
-        ).aggregate(Max('version'))
-        if not last_exp_version['version__max']:
+            nes_id=self.nes_id, owner=self.owner, is_current=True
+        ).values_list('version', flat=True).first()
+        if not last_exp_version:
             return 0
         else:
-            return last_exp_version['version__max']
+            return last_exp_version
+
+    def get_current_experiment(self):
+        return models.Experiment.objects.get(
+            nes_id=self.nes_id, owner=self.owner, is_current=True
+        )
+
+    def save_new_version(self, save):
+        """
+        Allocates a new version number and calls save with it, in a
+        transaction. Retries if the version number was taken meanwhile.
+        :param save: function that saves the experiment with the version
+        number passed
+        """
+        return run_allocating_versions(
+            lambda: save(allocate_versions(
+                self.owner, {self.nes_id: 1}
+            )[self.nes_id]),
+            self.owner, [self.nes_id]
+        )
+
+
+def allocate_versions(owner, counts):
+    """
+    Reserves new version numbers for experiments of owner, incrementing
+    their ExperimentVersionCounter rows. Must be called in a transaction:
+    the UPDATE locks the counter rows until the transaction ends, so
+    concurrent allocations for the same experiments wait for it instead of
+    getting the same numbers.
+    :param owner: experiments owner
+    :param counts: dict mapping experiment nes_ids to the number of versions
+    to reserve
+    :return: dict mapping experiment nes_ids to the first version number
+    reserved
+    """
+    counters = models.ExperimentVersionCounter.objects.filter(owner=owner)
+    nes_ids_by_count = defaultdict(list)
+    for nes_id, count in counts.items():
+        nes_ids_by_count[count].append(nes_id)
+    for count, nes_ids in nes_ids_by_count.items():
+        counters.filter(nes_id__in=nes_ids).update(
+            last_version=F('last_version') + count
+        )
+    last_versions = dict(counters.filter(nes_id__in=counts).values_list(
+        'nes_id', 'last_version'
+    ))
+
+    new_nes_ids = set(counts) - set(last_versions)
+    if new_nes_ids:
+        # Experiments with no counter yet start after their current version.
+        # If a concurrent transaction creates the counter meanwhile, this
+        # raises IntegrityError (see run_allocating_versions).
+        current_versions = dict(models.Experiment.objects.current().filter(
+            owner=owner, nes_id__in=new_nes_ids
+        ).values_list('nes_id', 'version'))
+        new_counters = [
+            models.ExperimentVersionCounter(
+                owner=owner, nes_id=nes_id,
+                last_version=current_versions.get(nes_id, 0) + counts[nes_id]
+            ) for nes_id in new_nes_ids
+        ]
+        models.ExperimentVersionCounter.objects.bulk_create(new_counters)
+        last_versions.update(
+            (counter.nes_id, counter.last_version) for counter in new_counters
+        )
+
+    return {
+        nes_id: last_versions[nes_id] - count + 1
+        for nes_id, count in counts.items()
+    }
+
+
+def run_allocating_versions(func, owner, nes_ids=None, attempts=3):
+    """
+    Runs func, that allocates versions of experiments with allocate_versions
+    and saves them, in a transaction. When saving fails because a version
+    number or a counter was taken by a concurrent transaction, or the
+    counters were behind the versions saved, resyncs the counters and runs
+    func again.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+            sync_version_counters(owner, nes_ids)
+
+
+def sync_version_counters(owner=None, nes_ids=None):
+    """
+    Brings counters up to the last version saved, for experiments saved
+    without allocating their versions.
+    """
+    experiments = models.Experiment.objects.all()
+    if owner is not None:
+        experiments = experiments.filter(owner=owner)
+    if nes_ids is not None:
+        experiments = experiments.filter(nes_id__in=nes_ids)
+    last_versions = experiments.values('owner', 'nes_id').annotate(
+        last_version=Max('version')
+    ).order_by()
+    with transaction.atomic():
+        for experiment in last_versions:
+            counter, created = \
+                models.ExperimentVersionCounter.objects.get_or_create(
+                    owner_id=experiment['owner'], nes_id=experiment['nes_id'],
+                    defaults={'last_version': experiment['last_version']}
+                )
+            if counter.last_version < experiment['last_version']:
+                counter.last_version = experiment['last_version']
+                counter.save(update_fields=['last_version'])
+
 
+def rebuild_current_experiments():
+    """
+    Recomputes Experiment.is_current flag for all experiments, from their
+    version numbers. Must be called after creating experiments in ways that
+    bypass Experiment.save, like bulk_create.
+    :return: number of experiment rows whose flag changed
+    """
+    newer_versions = models.Experiment.objects.filter(
+        owner=OuterRef('owner'), nes_id=OuterRef('nes_id'),
+        version__gt=OuterRef('version')
+    )
+    current = models.Experiment.objects.annotate(
+        has_newer_version=Exists(newer_versions)
+    ).filter(has_newer_version=False).values('id')
+    with transaction.atomic():
+        demoted = models.Experiment.objects.filter(is_current=True).exclude(
+            id__in=current
+        ).update(is_current=False, updated_at=timezone.now())
+        promoted = models.Experiment.objects.filter(
+            is_current=False, id__in=current
+        ).update(is_current=True, updated_at=timezone.now())
+    invalidate(models.Experiment)
+    return demoted + promoted
@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_indexes(sender, **kwargs):
+    from experiments.search import install_search_indexes
+    install_search_indexes()
 
 
 class ExperimentsConfig(AppConfig):
     name = 'experiments'
+
+    def ready(self):
+        # Connects signal receivers invalidating cached responses, and
+        # registers the models the responses of the views are built from
+        from experiments import caching, api, views  # noqa
+        # Registers the tasks run by background jobs
+        from experiments import tasks  # noqa
+        # Models snapshotted by django-reversion depend on settings
+        from experiments.versioning import register_models
+        register_models()
+        # Search indexes are kept by database triggers, (re)installed
+        # after migrations
+        post_migrate.connect(install_search_indexes, sender=self)
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+
+from experiments.appclasses import rebuild_current_experiments
+from experiments.models import Experiment, Researcher, Study, \
+    ExperimentStatus, ProtocolComponent, Group
+
+
+def seed_experiments(count, versions=2):
+    """
+    Creates experiment rows until there are count, versions rows by
+    experiment, spread over studies of 10 rows, with a protocol component
+    each. Called again with a larger count, adds the rows missing. Used by
+    benchmark management commands, against throwaway test databases.
+    """
+    owner, _ = User.objects.get_or_create(username='benchmark')
+    researcher, _ = Researcher.objects.get_or_create(nes_id=1, owner=owner)
+    status, _ = ExperimentStatus.objects.get_or_create(tag='to_be_approved')
+    Study.objects.bulk_create([
+        Study(nes_id=nes_id, title='Study %d' % nes_id,
+              description='Description', start_date=datetime.utcnow(),
+              researcher=researcher, owner=owner)
+        for nes_id in range(Study.objects.count() + 1, count // 10 + 2)
+    ])
+    studies = list(Study.objects.order_by('id'))
+    Experiment.objects.bulk_create([
+        Experiment(
+            nes_id=row // versions + 1, version=row % versions + 1,
+            title='Experiment %d' % row, description='Description',
+            study=studies[row % len(studies)], owner=owner, status=status
+        )
+        for row in range(Experiment.objects.count(), count)
+    ], batch_size=500)
+    # bulk_create bypasses Experiment.save, that maintains is_current
+    rebuild_current_experiments()
+    ProtocolComponent.objects.bulk_create([
+        ProtocolComponent(identification='Component', component_type='type',
+                          nes_id=1, experiment_id=experiment_id, owner=owner)
+        for experiment_id in Experiment.objects.filter(
+            protocol_components=None
+        ).values_list('id', flat=True)
+    ], batch_size=500)
+
+
+def seed_dataset(researchers, studies, experiments, versions, components,
+                 groups):
+    """
+    Creates researchers, with studies each, with experiments each, with
+    versions each, with protocol components and groups each. Rows are the
+    same from run to run, so that benchmarks can be compared. Used by
+    benchmark management commands, against throwaway test databases.
+    :return: the owner of all rows
+    """
+    owner = User.objects.create_user(username='benchmark')
+    status = ExperimentStatus.objects.create(tag='to_be_approved')
+    Researcher.objects.bulk_create([
+        Researcher(nes_id=nes_id, first_name='Researcher %d' % nes_id,
+                   surname='Surname', email='r%d@example.com' % nes_id,
+                   owner=owner)
+        for nes_id in range(1, researchers + 1)
+    ])
+    Study.objects.bulk_create([
+        Study(nes_id=nes_id, title='Study %d' % nes_id,
+              description='Description', start_date=datetime(2017, 1, 1),
+              researcher=researcher, owner=owner)
+        for nes_id, researcher in enumerate(
+            (researcher for researcher in Researcher.objects.order_by('id')
+             for _ in range(studies)), 1
+        )
+    ])
+    Experiment.objects.bulk_create([
+        Experiment(nes_id=nes_id, version=version,
+                   title='Experiment %d' % nes_id,
+                   description='Description of version %d' % version,
+                   study=study, owner=owner, status=status)
+        for nes_id, study in enumerate(
+            (study for study in Study.objects.order_by('id')
+             for _ in range(experiments)), 1
+        )
+        for version in range(1, versions + 1)
+    ], batch_size=500)
+    # bulk_create bypasses Experiment.save, that maintains is_current
+    rebuild_current_experiments()
+    # Protocol components and groups nes_ids are those of NES rows: unique
+    # by owner
+    experiment_ids = list(Experiment.objects.order_by('id')
+                          .values_list('id', flat=True))
+    ProtocolComponent.objects.bulk_create([
+        ProtocolComponent(identification='Component %d' % nes_id,
+                          component_type='type', duration_value=nes_id,
+                          nes_id=nes_id, experiment_id=experiment_id,
+                          owner=owner)
+        for nes_id, experiment_id in enumerate(
+            (experiment_id for experiment_id in experiment_ids
+             for _ in range(components)), 1
+        )
+    ], batch_size=500)
+    Group.objects.bulk_create([
+        Group(title='Group %d' % nes_id, description='Description',
+              nes_id=nes_id, experiment_id=experiment_id, owner=owner)
+        for nes_id, experiment_id in enumerate(
+            (experiment_id for experiment_id in experiment_ids
+             for _ in range(groups)), 1
+        )
+    ], batch_size=500)
+    return owner
+
+
+def measure(func, repeat=1):
+    """
+    :return: best time, in seconds, of repeat calls of func
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,136 @@
+from collections import namedtuple
+
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from experiments.caching import invalidate
+
+# An item of a bulk request that passed serializer validation
+BulkItem = namedtuple('BulkItem', ('index', 'data', 'validated_data'))
+
+
+class BulkCreateMixin:
+    """
+    Adds a bulk action to viewsets (POST <list url>/bulk/) that creates
+    objects from a list of items in one transaction, with bulk_create.
+    Invalid items are reported by their position in the list, valid ones
+    are created anyway.
+
+    get_bulk_objects returns the model objects to be created from the valid
+    items, owned by the request user. Viewsets whose items refer to other
+    objects or must be unique override it, resolving the related objects of
+    all items with a few queries.
+    """
+    bulk_max_items = 10000
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of items.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.bulk_max_items:
+            return Response(
+                {'detail': 'Too many items, the maximum is %d.' %
+                           self.bulk_max_items},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items, errors = [], []
+        for index, data in enumerate(request.data):
+            serializer = self.get_serializer(data=data)
+            if serializer.is_valid():
+                items.append(
+                    BulkItem(index, data, serializer.validated_data)
+                )
+            else:
+                add_error(errors, index, serializer.errors)
+
+        def create():
+            create_errors = list(errors)
+            objects = self.get_bulk_objects(items, create_errors) \
+                if items else []
+            model = self.get_serializer_class().Meta.model
+            model.objects.bulk_create(objects)
+            return objects, create_errors
+
+        objects, errors = self.run_bulk_create(create)
+        # bulk_create doesn't send the signals invalidating cached responses
+        invalidate(self.get_serializer_class().Meta.model)
+        errors.sort(key=lambda error: error['index'])
+        return Response(
+            {'created': len(objects), 'errors': errors},
+            status=status.HTTP_201_CREATED if objects or not errors
+            else status.HTTP_400_BAD_REQUEST
+        )
+
+    def run_bulk_create(self, create):
+        """
+        Runs create, that creates the objects and returns them with the
+        errors found, in a transaction.
+        """
+        with transaction.atomic():
+            return create()
+
+    def get_bulk_objects(self, items, errors):
+        """
+        :param items: list of BulkItem
+        :param errors: list where errors of invalid items are added with
+        add_error
+        :return: list of unsaved model objects
+        """
+        model = self.get_serializer_class().Meta.model
+        return [model(owner=self.request.user, **item.validated_data)
+                for item in items]
+
+
+def add_error(errors, index, item_errors):
+    errors.append({'index': index, 'errors': item_errors})
+
+
+def is_unique(errors, item, key, seen_keys, fields):
+    """
+    Checks that key, that identifies the object created from item, wasn't
+    seen yet (in database or in previous items), reporting an error if it
+    was.
+    :param seen_keys: set of keys seen, key is added to it
+    :param fields: names of the fields of the unique constraint
+    """
+    if key in seen_keys:
+        add_error(errors, item.index, {'non_field_errors': [
+            'The fields %s must make a unique set.' % ', '.join(fields)
+        ]})
+        return False
+    seen_keys.add(key)
+    return True
+
+
+def related_ids(items, field):
+    """
+    :return: set of the integer ids items refer to in field
+    """
+    ids = set()
+    for item in items:
+        try:
+            ids.add(int(item.data.get(field)))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def get_related(errors, item, field, related_objects):
+    """
+    Gets the object item refers to in field, reporting an error if it
+    doesn't exist.
+    :param related_objects: dict mapping integer ids to objects
+    """
+    try:
+        related_object = related_objects.get(int(item.data.get(field)))
+    except (TypeError, ValueError):
+        related_object = None
+    if related_object is None:
+        add_error(errors, item.index, {field: [
+            'Invalid pk "%s" - object does not exist.' % item.data.get(field)
+        ]})
+    return related_object
@@ -0,0 +1,186 @@
+import hashlib
+import secrets
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+
+from experiments import metrics
+
+# Headers kept with cached responses
+CACHED_HEADERS = ('Content-Type', 'Vary', 'Allow', 'ETag')
+# Labels of the models responses are built from, registered by the views
+# (see cache_anonymous_response and CachedResponseMixin): changes of other
+# models are not counted
+CACHED_MODELS = set()
+
+
+def get_cache():
+    return caches[settings.NEP_RESPONSE_CACHE]
+
+
+def register(models):
+    CACHED_MODELS.update(model._meta.label_lower for model in models)
+
+
+def invalidate(*models):
+    """
+    Invalidates the ETags and cached responses built from rows of models,
+    by giving their rows a new generation in the database, seen by all
+    processes. Called when rows are saved or deleted; code changing rows
+    without sending signals (bulk_create, QuerySet.update) must call it
+    too. Changes rolled back are not counted.
+    Generations are random, not counted: counts would be repeated, with
+    other rows, after rollbacks (of tests) or database restores.
+    """
+    from experiments.models import TableChange
+    labels = {model._meta.label_lower for model in models} & CACHED_MODELS
+    for label in sorted(labels):
+        generation = secrets.randbits(63)
+        changes = TableChange.objects.filter(model=label)
+        if changes.update(generation=generation):
+            continue
+        try:
+            with transaction.atomic():
+                TableChange.objects.create(model=label,
+                                           generation=generation)
+        except IntegrityError:
+            # Created by a concurrent transaction
+            changes.update(generation=generation)
+
+
+def get_generations(models):
+    """
+    :return: list of the generations of the rows of each of models, read
+    with a single query
+    """
+    from experiments.models import TableChange
+    labels = [model._meta.label_lower for model in models]
+    generations = dict(TableChange.objects.filter(
+        model__in=labels
+    ).values_list('model', 'generation'))
+    return [str(generations.get(label, 0)) for label in labels]
+
+
+def response_key(request, generations):
+    key = '\n'.join(
+        [request.get_full_path(), request.META.get('HTTP_ACCEPT', '')] +
+        generations
+    )
+    return 'nep:response:%s' % hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(request):
+    # Only anonymous reads: responses don't depend on who's asking
+    return settings.NEP_RESPONSE_CACHE_TIMEOUT and \
+        request.method in ('GET', 'HEAD') and \
+        not request.user.is_authenticated and \
+        'HTTP_AUTHORIZATION' not in request.META
+
+
+def compute_etag(request, generations):
+    """
+    Computes an ETag for the response to request from the generations of
+    the models it is built from (see get_generations), so that adding,
+    changing or deleting rows changes it.
+    """
+    parts = [request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+             str(request.user.pk)] + generations
+    return quote_etag(
+        hashlib.md5('\n'.join(parts).encode('utf-8')).hexdigest()
+    )
+
+
+def cached_response(view, request, models, *args, **kwargs):
+    """
+    Returns the response of view to request, answering 304 Not Modified to
+    conditional reads when rows of models didn't change since the ETag
+    sent, and caching responses to anonymous reads until rows of models
+    change.
+    :param models: models whose rows are used to build the response
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return view(request, *args, **kwargs)
+
+    cache = get_cache()
+    generations = get_generations(models)
+    key = response_key(request, generations) if is_cacheable(request) \
+        else None
+    cached = cache.get(key) if key else None
+    if key:
+        metrics.response_cache_requests.inc(
+            result='miss' if cached is None else 'hit'
+        )
+    if cached is not None:
+        status, content, headers = cached
+        response = HttpResponse(content, status=status)
+        for header, value in headers.items():
+            response[header] = value
+        return get_conditional_response(request, etag=headers.get('ETag'),
+                                        response=response)
+
+    etag = compute_etag(request, generations)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = view(request, *args, **kwargs)
+    if response.status_code == 200 and not response.streaming:
+        response['ETag'] = etag
+        if key:
+            if hasattr(response, 'render'):
+                response.render()
+            headers = {header: response[header]
+                       for header in CACHED_HEADERS
+                       if response.has_header(header)}
+            cache.set(key,
+                      (response.status_code, response.content, headers),
+                      settings.NEP_RESPONSE_CACHE_TIMEOUT)
+    return response
+
+
+def cache_anonymous_response(*models):
+    """
+    Decorator adding ETags to the responses of a function based view, and
+    caching its responses to anonymous reads until rows of models change.
+    """
+    register(models)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(view, request, models, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """
+    Adds ETags to viewset responses, and caches responses to anonymous
+    reads until rows of cache_models change. cache_models must include the
+    models of relations reachable with ?expand and of extra actions.
+    """
+    cache_models = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        register(cls.cache_models)
+
+    def dispatch(self, request, *args, **kwargs):
+        return cached_response(super().dispatch, request, self.cache_models,
+                               *args, **kwargs)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, update_fields=None, **kwargs):
+    # Logins save the last login time of users, not shown by the views
+    if sender._meta.label_lower == 'auth.user' and \
+            update_fields == {'last_login'}:
+        return
+    invalidate(sender)
@@ -0,0 +1,170 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, Http404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.negotiation import BaseContentNegotiation
+
+from experiments.storage import BLOBS_DIR
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """
+    Files are served whatever the Accept header: their content type is not
+    chosen by renderers. Errors are rendered with the first renderer.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class RangeFile:
+    """
+    File object reading at most length bytes from the current position of
+    file. Keeps fileno, so that WSGI servers can send it with sendfile.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(name, stat):
+    # Content addressed files are named by their sha256
+    if name.startswith(BLOBS_DIR + '/'):
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return quote_etag('%x-%x' % (stat.st_size, int(stat.st_mtime)))
+
+
+def parse_range(header, size):
+    """
+    Parses a Range header with a single byte range. Headers with several
+    ranges, or other units, are ignored.
+    :return: tuple (first byte position, number of bytes), None to send the
+    whole file, or False if the range can't be satisfied
+    """
+    match = RANGE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: last bytes of the file
+        length = min(int(last), size)
+        return (size - length, length) if length else False
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first > last:
+        return False
+    return first, last - first + 1
+
+
+def range_applies(request, etag, last_modified):
+    """
+    :return: whether the Range header applies, given If-Range
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, storage, name, filename=None):
+    """
+    Answers request with the file name in storage, with support for
+    conditional and range requests. The file is downloaded as filename,
+    if given, else with the file name in storage. When
+    settings.NEP_SENDFILE_HEADER is set, the transfer is delegated to the
+    front end web server. Otherwise the file is streamed with FileResponse,
+    that WSGI servers can send with sendfile, without copying it through
+    Python.
+    """
+    path = storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is not None:
+        return response
+
+    sendfile_header = settings.NEP_SENDFILE_HEADER
+    if sendfile_header:
+        # The front end server answers ranges itself
+        response = HttpResponse()
+        if sendfile_header == 'X-Accel-Redirect':
+            response[sendfile_header] = settings.NEP_SENDFILE_URL + quote(
+                name
+            )
+        else:
+            response[sendfile_header] = path
+    else:
+        byte_range = None
+        if range_applies(request, etag, last_modified):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'),
+                                     stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % stat.st_size
+            return response
+        file = open(path, 'rb')
+        if byte_range:
+            start, length = byte_range
+            file.seek(start)
+            response = FileResponse(RangeFile(file, length), status=206)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (
+                start, start + length - 1, stat.st_size
+            )
+        else:
+            length = stat.st_size
+            response = FileResponse(file)
+        response['Content-Length'] = length
+    response['Content-Type'] = mimetypes.guess_type(name)[0] or \
+        'application/octet-stream'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition(
+        filename or os.path.basename(name)
+    )
+    return response
+
+
+def content_disposition(filename):
+    """
+    :return: Content-Disposition value downloading a file as filename.
+    Names with characters other than ASCII are also given encoded (RFC
+    6266), for the clients that support it.
+    """
+    ascii_filename = filename.encode('ascii', 'ignore').decode('ascii') \
+        .replace('\\', '').replace('"', '')
+    value = 'attachment; filename="%s"' % ascii_filename
+    if ascii_filename != filename:
+        value += "; filename*=UTF-8''%s" % quote(filename)
+    return value
@@ -0,0 +1,68 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class DynamicFieldsSerializerMixin:
+    """
+    Serializer taking two optional arguments:
+    - fields: names of the only fields to be serialized;
+    - expand: names of fields to be serialized as nested objects instead
+      of primary keys or titles. Serializers list them, with the nested
+      serializers, in get_expandable_fields. Expanded fields are always
+      serialized.
+    Unknown names are answered with 400 Bad Request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', ())
+        super().__init__(*args, **kwargs)
+        if expand:
+            expandable_fields = self.get_expandable_fields()
+            unknown = set(expand) - set(expandable_fields)
+            if unknown:
+                raise ValidationError({'expand': [
+                    'Unknown fields: %s. Choose among: %s.' % (
+                        ', '.join(sorted(unknown)),
+                        ', '.join(sorted(expandable_fields))
+                    )
+                ]})
+            for name in expand:
+                self.fields[name] = expandable_fields[name]
+        if fields is not None:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise ValidationError({'fields': [
+                    'Unknown fields: %s.' % ', '.join(sorted(unknown))
+                ]})
+            for name in set(self.fields) - set(fields) - set(expand):
+                self.fields.pop(name)
+
+    def get_expandable_fields(self):
+        """
+        :return: dict mapping field names to the read only serializer
+        instances expanding them
+        """
+        return {}
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients choose the fields of objects read from API views with
+    ?fields=id,title and expand relations with ?expand=study (see
+    DynamicFieldsSerializerMixin). Relations of fields left out are not
+    fetched, as querysets are optimized for the serializer built here.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        request = getattr(self, 'request', None)
+        if request is not None and request.method in ('GET', 'HEAD'):
+            params = request.query_params
+            if 'fields' in params:
+                kwargs.setdefault('fields', parse_names(params['fields']))
+            if 'expand' in params:
+                kwargs.setdefault('expand', parse_names(params['expand']))
+        return super().get_serializer(*args, **kwargs)
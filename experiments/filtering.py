@@ -0,0 +1,85 @@
+from django import forms
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class BooleanField(forms.Field):
+    """
+    Form field for boolean query parameters: true/false or 1/0.
+    """
+    values = {'true': True, '1': True, 'false': False, '0': False}
+
+    def to_python(self, value):
+        try:
+            return self.values[value.lower()]
+        except KeyError:
+            raise forms.ValidationError('Enter true or false.')
+
+
+class Filter:
+    """
+    Filters list querysets by the value of a query parameter, cleaned by a
+    form field, with a field lookup.
+    """
+
+    def __init__(self, lookup, form_field=None, description=''):
+        self.lookup = lookup
+        self.form_field = form_field or forms.CharField()
+        self.description = description
+
+    def clean(self, value):
+        return self.form_field.clean(value)
+
+    def filter(self, queryset, value):
+        return queryset.filter(**{self.lookup: value})
+
+
+class FlagFilter(Filter):
+    """
+    Restricts list querysets to rows whose boolean lookup is true, when the
+    query parameter is true. A false parameter doesn't filter rows.
+    """
+
+    def __init__(self, lookup, description=''):
+        super().__init__(lookup, BooleanField(), description)
+
+    def filter(self, queryset, value):
+        if value:
+            return queryset.filter(**{self.lookup: True})
+        return queryset
+
+
+class FieldFilterBackend(BaseFilterBackend):
+    """
+    Filters list querysets by the query parameters declared in the view's
+    filter_fields, a dict mapping parameter names to Filter objects.
+    Invalid values are answered with 400 Bad Request.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = getattr(view, 'filter_fields', {})
+        errors = {}
+        for param, field_filter in filters.items():
+            if param not in request.query_params:
+                continue
+            try:
+                value = field_filter.clean(request.query_params[param])
+            except forms.ValidationError as error:
+                errors[param] = error.messages
+                continue
+            queryset = field_filter.filter(queryset, value)
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+    def get_schema_fields(self, view):
+        if coreapi is None:
+            return []
+        return [
+            coreapi.Field(
+                name=param, required=False, location='query',
+                schema=coreschema.String(description=field_filter.description)
+            ) for param, field_filter in getattr(view, 'filter_fields',
+                                                 {}).items()
+        ]
@@ -0,0 +1,310 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from experiments import metrics as registry
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+# Requests tracing memory allocations: tracing is process wide, started
+# with the first and stopped with the last
+_tracing_lock = threading.Lock()
+_tracing_requests = 0
+_tracing_started = False
+
+
+def current_metrics():
+    """
+    :return: RequestMetrics of the request instrumented in this thread, or
+    None
+    """
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def timer(name):
+    """
+    Adds the time spent in the block to the timing name of the request
+    instrumented, if any. Blocks nested in a block timing the same name are
+    not counted twice.
+    """
+    metrics = current_metrics()
+    if metrics is None or name in metrics.running:
+        yield
+        return
+    metrics.running.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - start
+        metrics.running.discard(name)
+
+
+class TimedCursor:
+    """
+    Wraps database cursors, counting the queries they execute and the time
+    spent executing them and fetching their rows.
+    """
+
+    def __init__(self, cursor, metrics):
+        self.cursor = cursor
+        self.metrics = metrics
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.cursor.__exit__(exc_type, exc_value, traceback)
+
+    def timed(self, method, *args, query=False):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.metrics.db_time += time.perf_counter() - start
+            if query:
+                self.metrics.queries += 1
+
+    def execute(self, sql, params=None):
+        return self.timed(self.cursor.execute, sql, params, query=True)
+
+    def executemany(self, sql, param_list):
+        return self.timed(self.cursor.executemany, sql, param_list,
+                          query=True)
+
+    def callproc(self, procname, params=None):
+        return self.timed(self.cursor.callproc, procname, params,
+                          query=True)
+
+    def fetchone(self):
+        return self.timed(self.cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self.timed(self.cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self.timed(self.cursor.fetchall)
+
+
+class RequestMetrics:
+    """
+    Measures of a request: SQL queries and the time spent running them,
+    timings of timer blocks (serialize, render), total time and, with
+    settings.NEP_INSTRUMENTATION_MEMORY, peak memory allocated by Python.
+    Measures are taken in the thread where they are started, between start
+    and stop calls.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.timings = defaultdict(float)
+        self.running = set()
+        self.total_time = 0
+        self.peak_memory = None
+        self.start_memory = None
+
+    def start(self):
+        _local.metrics = self
+        self.started_at = time.perf_counter()
+        for connection in connections.all():
+            prepare_cursor = connection._prepare_cursor
+            connection._prepare_cursor = \
+                lambda cursor, prepare_cursor=prepare_cursor: \
+                TimedCursor(prepare_cursor(cursor), self)
+        if settings.NEP_INSTRUMENTATION_MEMORY:
+            self.start_memory = start_tracing()
+
+    def stop(self):
+        self.total_time += time.perf_counter() - self.started_at
+        for connection in connections.all():
+            connection.__dict__.pop('_prepare_cursor', None)
+        if self.start_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0,
+                                   stop_tracing() - self.start_memory)
+            self.start_memory = None
+        _local.metrics = None
+
+    def server_timing(self):
+        """
+        :return: Server-Timing header value, durations in milliseconds
+        """
+        metrics = ['db;dur=%.1f;desc="%d queries"' % (
+            self.db_time * 1000, self.queries
+        )]
+        for name in sorted(self.timings):
+            metrics.append('%s;dur=%.1f' % (name, self.timings[name] * 1000))
+        if self.peak_memory is not None:
+            metrics.append('memory;desc="%d bytes"' % self.peak_memory)
+        metrics.append('total;dur=%.1f' % (self.total_time * 1000))
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        data = {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'total_ms': round(self.total_time * 1000, 1),
+            'peak_memory': self.peak_memory,
+        }
+        for name, timing in self.timings.items():
+            data['%s_ms' % name] = round(timing * 1000, 1)
+        return data
+
+
+def start_tracing():
+    """
+    Starts tracing memory allocations, if not already traced.
+    :return: size of the memory blocks traced
+    """
+    global _tracing_requests, _tracing_started
+    with _tracing_lock:
+        if not _tracing_requests and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_requests += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def stop_tracing():
+    """
+    Stops tracing memory allocations started by start_tracing, when no other
+    request traces them.
+    Peaks are those of all the requests running at the same time.
+    :return: peak size of the memory blocks traced
+    """
+    global _tracing_requests, _tracing_started
+    with _tracing_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracing_requests -= 1
+        if not _tracing_requests and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+        return peak
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else None
+
+
+def get_view_labels(request):
+    """
+    :return: tuple (view, action) naming the view answering request, and
+    the viewset action run, or the method for other views. Both are empty
+    for requests not resolved.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '', ''
+    view = getattr(match.func, 'cls', match.func)
+    actions = getattr(match.func, 'actions', None) or {}
+    method = request.method.lower()
+    return view.__name__, actions.get(method, method)
+
+
+class InstrumentationMiddleware:
+    """
+    Measures requests (see RequestMetrics) when settings.NEP_INSTRUMENTATION
+    or settings.NEP_METRICS is set.
+    With NEP_INSTRUMENTATION, measures are sent in the Server-Timing header
+    of responses and logged by the experiments.instrumentation logger as a
+    JSON object by request, with the route (url name) and status; the
+    request_stats management command aggregates them. Streamed responses
+    are measured until their last byte is sent: they are only logged.
+    With NEP_METRICS, request counts, durations and queries are added to
+    the metrics exported by the metrics view (see experiments.metrics).
+    Must be the first middleware, to measure the others and render times.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NEP_INSTRUMENTATION and not settings.NEP_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop()
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, metrics
+            )
+        else:
+            if settings.NEP_INSTRUMENTATION:
+                response['Server-Timing'] = metrics.server_timing()
+            self.record(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = current_metrics()
+        if metrics is not None:
+            started_at = time.perf_counter()
+
+            def rendered(response):
+                metrics.timings['render'] += \
+                    time.perf_counter() - started_at
+            response.add_post_render_callback(rendered)
+        return response
+
+    def stream(self, content, request, response, metrics):
+        metrics.start()
+        try:
+            yield from content
+        finally:
+            metrics.stop()
+            self.record(request, response, metrics)
+
+    @staticmethod
+    def record(request, response, metrics):
+        if settings.NEP_METRICS:
+            view, action = get_view_labels(request)
+            registry.requests_total.inc(view=view, action=action,
+                                        method=request.method,
+                                        status=response.status_code)
+            registry.request_duration.observe(metrics.total_time, view=view,
+                                              action=action)
+            registry.request_queries.observe(metrics.queries, view=view,
+                                             action=action)
+        if not settings.NEP_INSTRUMENTATION:
+            return
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'route': get_route(request),
+            'status': response.status_code,
+        }
+        data.update(metrics.as_dict())
+        logger.info(json.dumps(data, sort_keys=True))
+
+
+class SerializerTimingMixin:
+    """
+    Times serializers in the serialize timing of instrumented requests.
+    """
+
+    def to_representation(self, instance):
+        # Called for every object serialized: skip the timer when there's
+        # nothing to time
+        if current_metrics() is None:
+            return super().to_representation(instance)
+        with timer('serialize'):
+            return super().to_representation(instance)
@@ -0,0 +1,156 @@
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from experiments.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered tasks, by name (see task)
+TASKS = {}
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by tasks failing for reasons retries won't fix, like invalid
+    files: their jobs fail without being retried.
+    """
+
+
+class Task:
+
+    def __init__(self, function, name, max_attempts):
+        self.function = function
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.function(**kwargs)
+
+
+def task(name=None, max_attempts=None):
+    """
+    Decorator registering a function as a task, that jobs run with the
+    keyword arguments given to enqueue.
+    :param name: task name, defaults to the function name
+    :param max_attempts: times jobs are attempted before failing,
+    defaults to settings.NEP_JOBS_MAX_ATTEMPTS
+    """
+    def register(function):
+        registered = Task(function, name or function.__name__,
+                          max_attempts or settings.NEP_JOBS_MAX_ATTEMPTS)
+        TASKS[registered.name] = registered
+        return registered
+    return register
+
+
+def enqueue(name, owner=None, **kwargs):
+    """
+    Queues a job running the task name with kwargs. The job is created in
+    the current transaction: it is not run if the transaction is rolled
+    back, nor before it is committed.
+    :param owner: user the job is run for, that can follow its status
+    :return: the queued Job
+    """
+    return Job.objects.create(
+        name=name, owner=owner, arguments=json.dumps(kwargs),
+        max_attempts=TASKS[name].max_attempts
+    )
+
+
+def retry_delay(attempts):
+    """
+    :return: seconds to wait before attempting again a job that failed
+    attempts times: exponential back off from settings.NEP_JOBS_RETRY_DELAY
+    """
+    return settings.NEP_JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def claim_job():
+    """
+    Marks the next job due as running. Jobs are claimed with a conditional
+    update, so that concurrent workers never run the same job.
+    :return: the claimed job, or None if no job is due
+    """
+    while True:
+        now = timezone.now()
+        job = Job.objects.filter(
+            status=Job.QUEUED, run_after__lte=now
+        ).order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, started_at=now,
+            updated_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """
+    Runs a claimed job in a transaction. Failed jobs are queued again,
+    after a delay, until they have been attempted max_attempts times.
+    """
+    try:
+        if job.name not in TASKS:
+            raise PermanentJobError('Unknown task %s.' % job.name)
+        with transaction.atomic():
+            TASKS[job.name](**json.loads(job.arguments))
+    except Exception as error:
+        job.last_error = '%s: %s' % (type(error).__name__, error)
+        if isinstance(error, PermanentJobError) or \
+                job.attempts >= job.max_attempts:
+            logger.exception('Job %d (%s) failed', job.pk, job.name)
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        else:
+            logger.warning('Job %d (%s) failed, will be retried',
+                           job.pk, job.name, exc_info=True)
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            )
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def requeue_stale_jobs(timeout):
+    """
+    Queues again jobs running for more than timeout seconds, left by
+    workers that died. Those attempted max_attempts times fail instead.
+    :return: number of jobs queued again
+    """
+    now = timezone.now()
+    stale_jobs = Job.objects.filter(
+        status=Job.RUNNING, started_at__lt=now - timedelta(seconds=timeout)
+    )
+    stale_jobs.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='Timed out.', finished_at=now,
+        updated_at=now
+    )
+    return stale_jobs.update(status=Job.QUEUED, updated_at=now)
+
+
+def run_pending_jobs(limit=None):
+    """
+    Runs the jobs due, until there are none or limit jobs have been run.
+    :return: number of jobs run
+    """
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
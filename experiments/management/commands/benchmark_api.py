@@ -0,0 +1,304 @@
+import json
+import math
+import platform
+import statistics
+import subprocess
+from collections import namedtuple
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases, \
+    setup_test_environment, teardown_test_environment, override_settings, \
+    CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from experiments.benchmarks import seed_dataset, measure
+from experiments.models import Experiment, Researcher, Study
+
+# First nes_id of rows created by create endpoints, past seeded ones
+CREATED_NES_ID = 1000000
+
+Endpoint = namedtuple('Endpoint', 'name method path payload')
+
+
+class Command(BaseCommand):
+    help = 'Measures latency, throughput and SQL queries of the home page ' \
+           'and of API list, detail and create endpoints, against a ' \
+           'throwaway test database seeded with synthetic rows. Results ' \
+           'can be saved as JSON and compared with those of another run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--researchers', type=int, default=10,
+            help='Number of researchers'
+        )
+        parser.add_argument(
+            '--studies', type=int, default=5,
+            help='Number of studies of each researcher'
+        )
+        parser.add_argument(
+            '--experiments', type=int, default=20,
+            help='Number of experiments of each study'
+        )
+        parser.add_argument(
+            '--versions', type=int, default=3,
+            help='Number of versions of each experiment'
+        )
+        parser.add_argument(
+            '--components', type=int, default=3,
+            help='Number of protocol components of each experiment version'
+        )
+        parser.add_argument(
+            '--groups', type=int, default=2,
+            help='Number of groups of each experiment version'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Number of requests timed by endpoint, after one warm '
+                 'up request and before one counting queries'
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Name of an endpoint to benchmark, like "experiments '
+                 'list" (repeatable; default: all)'
+        )
+        parser.add_argument(
+            '--json',
+            help='File the results are written to as JSON, - for the '
+                 'standard output'
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON results of a previous run to compare with'
+        )
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='With --compare, fail if the median latency of an '
+                 'endpoint grows by more than this percentage, or if its '
+                 'number of queries grows'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        baseline = self.load(options['compare']) if options['compare'] \
+            else None
+        dataset = {name: options[name] for name in (
+            'researchers', 'studies', 'experiments', 'versions',
+            'components', 'groups'
+        )}
+        if baseline is not None and baseline.get('dataset') != dataset:
+            self.stderr.write('The compared results were measured with '
+                              'another dataset: %s.' % baseline.get('dataset'))
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Measure responses being built, not the response cache
+            with override_settings(NEP_RESPONSE_CACHE_TIMEOUT=0):
+                owner = seed_dataset(**dataset)
+                results = self.run_benchmark(owner, options['endpoints'],
+                                             options['requests'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'requests': options['requests'],
+            'results': results,
+        }
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            if options['json']:
+                with open(options['json'], 'w') as file:
+                    json.dump(report, file, indent=2)
+            self.write_table(results, baseline)
+        if baseline is not None and options['max_regression'] is not None:
+            self.check_regressions(results, baseline,
+                                   options['max_regression'])
+
+    def get_endpoints(self, owner):
+        """
+        :return: list of Endpoint. payload is None for reads, else a
+        function returning the data of the nth create request.
+        """
+        researcher = Researcher.objects.filter(owner=owner).first()
+        study = Study.objects.filter(owner=owner).first()
+        experiment = Experiment.objects.current().filter(owner=owner).first()
+        # Experiment details and protocol components creation are only
+        # answered for experiments with one version (see
+        # ExperimentViewSet.get_queryset and
+        # ProtocolComponentViewSet.perform_create)
+        single_version = Experiment.objects.create(
+            nes_id=CREATED_NES_ID - 1, version=1, title='Benchmark',
+            description='Description', study=study, owner=owner
+        )
+        endpoints = [Endpoint('home page', 'GET', reverse('home'), None)]
+        for name, nes_id, payload in (
+            ('researchers', researcher.nes_id, lambda n: {
+                'first_name': 'Researcher', 'surname': 'Surname',
+                'email': 'r@example.com', 'nes_id': CREATED_NES_ID + n,
+            }),
+            ('studies', study.nes_id, lambda n: {
+                'title': 'Study', 'description': 'Description',
+                'start_date': '2017-01-01', 'nes_id': CREATED_NES_ID + n,
+                'researcher': researcher.id,
+            }),
+            ('experiments', single_version.nes_id, lambda n: {
+                'title': 'Experiment', 'description': 'Description',
+                'nes_id': CREATED_NES_ID + n, 'study': study.id,
+            }),
+            ('protocol_components', 1, lambda n: {
+                'identification': 'Component', 'description': 'Description',
+                'duration_value': 1, 'component_type': 'type',
+                'nes_id': CREATED_NES_ID + n,
+                'experiment': single_version.nes_id,
+            }),
+        ):
+            endpoints.extend([
+                Endpoint('%s list' % name, 'GET',
+                         reverse('api_%s-list' % name), None),
+                Endpoint('%s detail' % name, 'GET',
+                         reverse('api_%s-detail' % name,
+                                 kwargs={'nes_id': nes_id}), None),
+                Endpoint('%s create' % name, 'POST',
+                         reverse('api_%s-list' % name), payload),
+            ])
+        groups_url = reverse('api_groups-list',
+                             kwargs={'nes_id': experiment.nes_id})
+        endpoints.extend([
+            Endpoint('groups list', 'GET', groups_url, None),
+            Endpoint('groups create', 'POST', groups_url, lambda n: {
+                'title': 'Group', 'description': 'Description',
+                'nes_id': CREATED_NES_ID + n,
+                'experiment': experiment.nes_id,
+            }),
+        ])
+        return endpoints
+
+    def run_benchmark(self, owner, names, requests):
+        endpoints = self.get_endpoints(owner)
+        if names:
+            unknown = set(names) - {endpoint.name for endpoint in endpoints}
+            if unknown:
+                raise CommandError('Unknown endpoints: %s.' % ', '.join(
+                    sorted(unknown)
+                ))
+            endpoints = [endpoint for endpoint in endpoints
+                         if endpoint.name in names]
+        client = Client()
+        client.force_login(owner)
+        return [self.benchmark(client, endpoint, requests)
+                for endpoint in endpoints]
+
+    @staticmethod
+    def benchmark(client, endpoint, requests):
+        timings, responses = [], []
+
+        def request(n):
+            if endpoint.payload is None:
+                responses.append(client.get(endpoint.path))
+            else:
+                responses.append(client.post(endpoint.path,
+                                             endpoint.payload(n)))
+
+        request(0)  # Warm up
+        for n in range(1, requests + 1):
+            timings.append(measure(lambda: request(n)))
+        timings.sort()
+        # Queries are counted in a request of their own, not timed:
+        # capturing them slows requests down
+        with CaptureQueriesContext(connection) as queries:
+            request(requests + 1)
+        statuses = sorted({response.status_code for response in responses})
+        return {
+            'name': endpoint.name,
+            'method': endpoint.method,
+            'path': endpoint.path,
+            'statuses': statuses,
+            'median_ms': round(statistics.median(timings) * 1000, 2),
+            'p95_ms': round(
+                timings[math.ceil(0.95 * len(timings)) - 1] * 1000, 2
+            ),
+            'min_ms': round(timings[0] * 1000, 2),
+            'max_ms': round(timings[-1] * 1000, 2),
+            'requests_per_second': round(len(timings) / sum(timings), 1),
+            'queries': len(queries),
+            'response_bytes': len(responses[-1].content),
+        }
+
+    def write_table(self, results, baseline):
+        baseline = {result['name']: result
+                    for result in (baseline or {}).get('results', [])}
+        self.stdout.write('%-28s %8s %10s %10s %10s %8s %8s' % (
+            'endpoint', 'status', 'median ms', 'p95 ms', 'req/s', 'queries',
+            'change'
+        ))
+        for result in results:
+            previous = baseline.get(result['name'])
+            change = '%+.0f%%' % self.change(result, previous) \
+                if previous else ''
+            self.stdout.write('%-28s %8s %10.1f %10.1f %10.1f %8d %8s' % (
+                result['name'], ','.join(map(str, result['statuses'])),
+                result['median_ms'], result['p95_ms'],
+                result['requests_per_second'], result['queries'], change
+            ))
+
+    @staticmethod
+    def change(result, previous):
+        """
+        :return: change of median latency from previous, in percent
+        """
+        return 100 * (result['median_ms'] - previous['median_ms']) / \
+            previous['median_ms']
+
+    def check_regressions(self, results, baseline, max_regression):
+        previous_results = {result['name']: result
+                            for result in baseline['results']}
+        regressions = []
+        for result in results:
+            previous = previous_results.get(result['name'])
+            if previous is None:
+                continue
+            if self.change(result, previous) > max_regression:
+                regressions.append('%s: median %.1f ms, was %.1f ms' % (
+                    result['name'], result['median_ms'],
+                    previous['median_ms']
+                ))
+            if result['queries'] > previous['queries']:
+                regressions.append('%s: %d queries, was %d' % (
+                    result['name'], result['queries'], previous['queries']
+                ))
+        if regressions:
+            raise CommandError('Regressions:\n%s' % '\n'.join(regressions))
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError('Cannot read results %s: %s.' % (path, error))
+
+
+def get_commit():
+    """
+    :return: hash of the git commit checked out, or None
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            stderr=subprocess.DEVNULL
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
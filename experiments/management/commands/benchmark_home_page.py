@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases, \
+    setup_test_environment, teardown_test_environment, override_settings
+
+from experiments.benchmarks import seed_experiments, measure
+from experiments.views import get_current_experiments
+
+
+class Command(BaseCommand):
+    help = 'Measures home page latency with growing number of experiment ' \
+           'rows. Runs against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+            help='Numbers of experiment rows to benchmark with'
+        )
+        parser.add_argument(
+            '--versions', type=int, default=2,
+            help='Number of versions of each experiment'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of measures taken for each size (best is reported)'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Measure the page being built, not the response cache
+            with override_settings(NEP_RESPONSE_CACHE_TIMEOUT=0):
+                self.run_benchmark(
+                    sorted(options['sizes']), options['versions'],
+                    options['repeat']
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, sizes, versions, repeat):
+        client = Client()
+
+        self.stdout.write('%10s %15s %15s' % ('rows', 'query (ms)',
+                                              'home page (ms)'))
+        for size in sizes:
+            seed_experiments(size, versions)
+            query_time = measure(lambda: len(get_current_experiments()),
+                                 repeat)
+            page_time = measure(lambda: client.get('/'), repeat)
+            self.stdout.write('%10d %15.1f %15.1f' % (
+                size, query_time * 1000, page_time * 1000
+            ))
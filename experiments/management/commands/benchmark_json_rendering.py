@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases, \
+    setup_test_environment, teardown_test_environment, override_settings
+from rest_framework import renderers
+
+from experiments.api import ExperimentSerializer
+from experiments.benchmarks import seed_experiments, measure
+from experiments.models import Experiment
+from experiments.renderers import JSONRenderer, BACKENDS
+from experiments.values import ValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measures the time taken to render /api/experiments/ lists as ' \
+           'JSON by rest framework, and by experiments.renderers with ' \
+           'each JSON library installed. Runs against a throwaway test ' \
+           'database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--experiments', type=int, default=10000,
+            help='Number of experiments rendered'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of measures taken for each renderer (best is '
+                 'reported)'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed_experiments(options['experiments'])
+            self.run_benchmark(options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, repeat):
+        # The list the experiments view renders
+        values_serializer = ValuesSerializer.compile(ExperimentSerializer(),
+                                                     prefetch=('status',))
+        data = values_serializer.serialize(
+            values_serializer.values(Experiment.objects.order_by('id'))
+        )
+        expected = renderers.JSONRenderer().render(data)
+        backends = []
+        for backend, module, _, _ in BACKENDS:
+            if module is None:
+                continue
+            with override_settings(NEP_JSON_BACKEND=backend):
+                if JSONRenderer().render(data) != expected:
+                    raise CommandError('%s output differs.' % backend)
+            backends.append(backend)
+        # Renderers are measured in turns, so that they all run in the
+        # same conditions
+        timings = {name: [] for name in ['rest_framework'] + backends}
+        for _ in range(repeat):
+            timings['rest_framework'].append(measure(
+                lambda: renderers.JSONRenderer().render(data)
+            ))
+            for backend in backends:
+                with override_settings(NEP_JSON_BACKEND=backend):
+                    timings[backend].append(measure(
+                        lambda: JSONRenderer().render(data)
+                    ))
+        baseline = min(timings['rest_framework'])
+        self.stdout.write('%-24s %12s %8s' % ('renderer', 'render (ms)',
+                                              'speedup'))
+        for name, backend_timings in timings.items():
+            timing = min(backend_timings)
+            self.stdout.write('%-24s %12.1f %7.1fx' % (
+                name, timing * 1000, baseline / timing
+            ))
+        for backend, module, _, _ in BACKENDS:
+            if module is None:
+                self.stdout.write('%-24s %12s' % (backend, 'not installed'))
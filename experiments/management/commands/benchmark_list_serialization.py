@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases, \
+    setup_test_environment, teardown_test_environment, override_settings
+
+from experiments.benchmarks import seed_experiments, measure
+
+ENDPOINTS = ('/api/experiments/', '/api/studies/')
+
+
+class Command(BaseCommand):
+    help = 'Compares list endpoints serialized by serializers and from ' \
+           '.values() rows (see experiments.values): checks the responses ' \
+           'are the same and measures their latency. Runs against a ' \
+           'throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--experiments', type=int, default=10000,
+            help='Number of experiment rows'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=1000,
+            help='Number of objects by page'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of measures taken for each list (best is reported)'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Measure lists being built, not the response cache
+            with override_settings(NEP_RESPONSE_CACHE_TIMEOUT=0):
+                seed_experiments(options['experiments'])
+                self.run_benchmark(options['page_size'], options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, page_size, repeat):
+        client = Client()
+        self.stdout.write('%-28s %16s %16s %8s' % (
+            'list', 'serializer (ms)', 'values (ms)', 'speedup'
+        ))
+        for endpoint in ENDPOINTS:
+            for label, data in (('page', {'page_size': page_size}),
+                                ('stream', {'stream': 1})):
+                timings = []
+                contents = []
+                for values_lists in (False, True):
+                    with override_settings(NEP_VALUES_LISTS=values_lists):
+                        timings.append(measure(
+                            lambda: contents.append(
+                                self.get(client, endpoint, data)
+                            ), repeat
+                        ))
+                if len(set(contents)) != 1:
+                    raise CommandError('%s %s responses differ.' % (
+                        endpoint, label
+                    ))
+                self.stdout.write('%-28s %16.1f %16.1f %7.1fx' % (
+                    '%s (%s)' % (endpoint, label), timings[0] * 1000,
+                    timings[1] * 1000, timings[0] / timings[1]
+                ))
+
+    @staticmethod
+    def get(client, endpoint, data):
+        response = client.get(endpoint, data)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
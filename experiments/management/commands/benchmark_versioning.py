@@ -0,0 +1,92 @@
+import reversion
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.test.utils import setup_databases, teardown_databases, \
+    setup_test_environment, teardown_test_environment
+from reversion.models import Revision, Version
+
+from experiments.benchmarks import seed_dataset, measure
+from experiments.models import Experiment, ProtocolComponent
+from experiments.versioning import register_models, STRATEGIES
+
+MODEL = 'experiments.ProtocolComponent'
+
+
+class Command(BaseCommand):
+    help = 'Measures protocol component write throughput, and the ' \
+           'snapshots stored, with each versioning strategy. Runs ' \
+           'against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--objects', type=int, default=1000,
+            help='Number of protocol components written with each strategy'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.run_benchmark(options['objects'])
+        finally:
+            # Restore the strategies of settings
+            register_models()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, objects):
+        owner = seed_dataset(researchers=1, studies=1, experiments=1,
+                             versions=1, components=0, groups=0)
+        experiment = Experiment.objects.get()
+        content_type = ContentType.objects.get_for_model(ProtocolComponent)
+
+        self.stdout.write('%-10s %12s %12s %12s %10s %12s' % (
+            'strategy', 'create (/s)', 'resave (/s)', 'change (/s)',
+            'versions', 'bytes'
+        ))
+        for strategy in STRATEGIES[::-1]:
+            register_models({MODEL: strategy})
+            components = [
+                ProtocolComponent(
+                    identification='Component %d' % nes_id,
+                    component_type='Type', nes_id=nes_id,
+                    experiment=experiment, owner=owner
+                )
+                for nes_id in range(1, objects + 1)
+            ]
+            create_rate = self.save_rate(components,
+                                         lambda component: None)
+            # Saves without changes, like PUTs of unchanged objects
+            resave_rate = self.save_rate(components,
+                                         lambda component: None)
+            change_rate = self.save_rate(
+                components,
+                lambda component: setattr(component, 'description',
+                                          'Changed %s' % strategy)
+            )
+            versions = Version.objects.filter(content_type=content_type)
+            self.stdout.write('%-10s %12.0f %12.0f %12.0f %10d %12d' % (
+                strategy, create_rate, resave_rate, change_rate,
+                versions.count(),
+                versions.aggregate(
+                    size=Sum(Length('serialized_data'))
+                )['size'] or 0
+            ))
+            ProtocolComponent.objects.all().delete()
+            Revision.objects.all().delete()
+
+    @staticmethod
+    def save_rate(components, change):
+        """
+        Saves components after calling change on each, one revision per
+        save, like API requests.
+        :return: saves per second
+        """
+        def save():
+            for component in components:
+                change(component)
+                with reversion.create_revision(atomic=False):
+                    component.save()
+        return len(components) / measure(save)
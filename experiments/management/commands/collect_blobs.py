@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from experiments.models import Blob, Experiment
+from experiments.storage import BLOBS_DIR
+
+
+class Command(BaseCommand):
+    help = 'Recounts references to experiment files saved by content, ' \
+           'and deletes the files no longer referenced.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report unreferenced files without deleting them'
+        )
+
+    def handle(self, *args, **options):
+        storage = Experiment._meta.get_field('ethics_committee_file').storage
+        with transaction.atomic():
+            references = dict(
+                Experiment.objects.exclude(ethics_committee_file='').values(
+                    'ethics_committee_file'
+                ).annotate(count=Count('pk')).values_list(
+                    'ethics_committee_file', 'count'
+                )
+            )
+            for blob in Blob.objects.select_for_update():
+                count = references.get(blob.name, 0)
+                if blob.references != count:
+                    blob.references = count
+                    blob.save(update_fields=['references'])
+            unreferenced = list(Blob.objects.filter(
+                references=0, name__startswith=BLOBS_DIR + '/'
+            ))
+            if not options['dry_run']:
+                for blob in unreferenced:
+                    storage.delete(blob.name)
+                    blob.delete()
+        self.stdout.write('%d unreferenced files %s.' % (
+            len(unreferenced),
+            'found' if options['dry_run'] else 'deleted'
+        ))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from experiments.models import ChunkedUpload
+from experiments.uploads import delete_upload
+
+
+class Command(BaseCommand):
+    help = 'Deletes chunked uploads left incomplete, with their partial ' \
+           'files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help='Delete uploads without chunks received for this many hours'
+        )
+
+    def handle(self, *args, **options):
+        stale_uploads = ChunkedUpload.objects.filter(
+            completed_at__isnull=True,
+            updated_at__lt=timezone.now() - timedelta(hours=options['hours'])
+        )
+        count = 0
+        for upload in stale_uploads.iterator():
+            delete_upload(upload)
+            count += 1
+        self.stdout.write('%d stale uploads deleted.' % count)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from experiments.appclasses import rebuild_current_experiments, \
+    sync_version_counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes which experiment version is the current one for ' \
+           'every experiment, and brings version counters up to date.'
+
+    def handle(self, *args, **options):
+        changed = rebuild_current_experiments()
+        self.stdout.write('%d experiment versions updated.' % changed)
+        sync_version_counters()
@@ -0,0 +1,131 @@
+import json
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Upper bounds, in milliseconds, of the buckets of histograms
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def parse_line(line):
+    """
+    :return: the request measures logged in line by
+    experiments.instrumentation, or None if line has none. Log formats
+    may prefix the JSON object.
+    """
+    start = line.find('{')
+    if start == -1:
+        return None
+    try:
+        data = json.loads(line[start:])
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or 'total_ms' not in data:
+        return None
+    return data
+
+
+def percentile(values, percent):
+    """
+    :param values: sorted values
+    """
+    index = int(round((len(values) - 1) * percent / 100))
+    return values[index]
+
+
+def histogram(values):
+    """
+    :return: number of values by bucket, the last one counting values
+    larger than BUCKETS
+    """
+    counts = [0] * (len(BUCKETS) + 1)
+    for value in values:
+        index = 0
+        while index < len(BUCKETS) and value > BUCKETS[index]:
+            index += 1
+        counts[index] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Aggregates by route the request measures logged by ' \
+           'experiments.instrumentation (see NEP_INSTRUMENTATION): ' \
+           'response times, queries and database time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'logs', nargs='*', default=['-'],
+            help='Log files, - for the standard input (default)'
+        )
+        parser.add_argument(
+            '--sort', choices=('total', 'queries', 'requests'),
+            default='total',
+            help='Sort routes by 95th percentile of response time, mean '
+                 'number of queries or number of requests'
+        )
+        parser.add_argument(
+            '--histogram', action='store_true',
+            help='Also print the histogram of response times of each route'
+        )
+
+    def handle(self, *args, **options):
+        routes = defaultdict(list)
+        for path in options['logs']:
+            for data in self.read(path):
+                route = '%s %s' % (data.get('method'),
+                                   data.get('route') or '(unresolved)')
+                routes[route].append(data)
+        if not routes:
+            raise CommandError('No request measures found.')
+
+        stats = [self.get_stats(route, requests)
+                 for route, requests in routes.items()]
+        stats.sort(key=lambda stat: stat[options['sort']], reverse=True)
+        self.stdout.write('%-44s %8s %8s %8s %8s %8s %8s' % (
+            'route', 'requests', 'p50 ms', 'p95 ms', 'max ms', 'queries',
+            'db ms'
+        ))
+        for stat in stats:
+            self.stdout.write(
+                '%(route)-44s %(requests)8d %(p50)8.1f %(total)8.1f '
+                '%(max)8.1f %(queries)8.1f %(db)8.1f' % stat
+            )
+        if options['histogram']:
+            for stat in stats:
+                self.write_histogram(stat)
+
+    def read(self, path):
+        if path == '-':
+            yield from filter(None, map(parse_line, sys.stdin))
+            return
+        try:
+            with open(path, encoding='utf-8', errors='replace') as log:
+                yield from filter(None, map(parse_line, log))
+        except OSError as error:
+            raise CommandError('Cannot read %s: %s.' % (path, error))
+
+    @staticmethod
+    def get_stats(route, requests):
+        times = sorted(request['total_ms'] for request in requests)
+        return {
+            'route': route,
+            'requests': len(requests),
+            'p50': percentile(times, 50),
+            'total': percentile(times, 95),
+            'max': times[-1],
+            'queries': sum(request.get('queries', 0)
+                           for request in requests) / len(requests),
+            'db': sum(request.get('db_ms', 0)
+                      for request in requests) / len(requests),
+            'histogram': histogram(times),
+        }
+
+    def write_histogram(self, stat):
+        self.stdout.write('\n%s' % stat['route'])
+        width = max(stat['histogram'])
+        labels = ['<= %d ms' % bound for bound in BUCKETS] + \
+            ['> %d ms' % BUCKETS[-1]]
+        for label, count in zip(labels, stat['histogram']):
+            bar = '#' * int(round(40 * count / width))
+            self.stdout.write('%12s %8d %s' % (label, count, bar))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from experiments.jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs, polling the job queue until ' \
+           'interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the jobs due, then exit'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Seconds to wait before polling the queue again when empty'
+        )
+        parser.add_argument(
+            '--timeout', type=int, default=3600,
+            help='Queue again jobs running for this many seconds, left by '
+                 'workers that died'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stale_jobs(options['timeout'])
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write('%d jobs run.' % count)
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
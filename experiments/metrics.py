@@ -0,0 +1,176 @@
+import math
+import threading
+from bisect import bisect_left
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds of request latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Upper bounds of query count buckets
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def format_labels(labels):
+    """
+    :param labels: sequence of (name, value) pairs
+    """
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+
+
+class Metric:
+    """
+    Metric with values by label values, updated from any thread.
+    """
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError('%s labels are %s.' % (self.name,
+                                                    ', '.join(self.labels)))
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """
+        :return: list of (name suffix, labels, value) tuples
+        """
+        with self.lock:
+            return [('', list(zip(self.labels, key)), value)
+                    for key, value in sorted(self.values.items())]
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s %s' % (self.name, self.type)]
+        for suffix, labels, value in self.samples():
+            lines.append('%s%s%s %s' % (self.name, suffix,
+                                        format_labels(labels),
+                                        format_value(value)))
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """
+    Counts observed values in buckets of upper bounds buckets, exported
+    cumulated, with their sum and count.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets),
+                                                  0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = counts, total + value
+
+    def samples(self):
+        samples = []
+        for _, labels, (counts, total) in super().samples():
+            cumulated = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulated += count
+                samples.append(('_bucket',
+                                labels + [('le', format_value(float(bound)))],
+                                cumulated))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, cumulated))
+        return samples
+
+
+class Registry:
+    """
+    Metrics of this process, exported by the metrics view. Each process
+    serving requests has its own: scrape them separately, or serve the
+    API from one process.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+requests_total = REGISTRY.register(Counter(
+    'nep_http_requests_total', 'Requests answered.',
+    ('view', 'action', 'method', 'status')
+))
+request_duration = REGISTRY.register(Histogram(
+    'nep_http_request_duration_seconds', 'Time taken to answer requests.',
+    ('view', 'action'), LATENCY_BUCKETS
+))
+request_queries = REGISTRY.register(Histogram(
+    'nep_http_request_queries', 'SQL queries run by requests.',
+    ('view', 'action'), QUERY_BUCKETS
+))
+response_cache_requests = REGISTRY.register(Counter(
+    'nep_response_cache_requests_total',
+    'Cacheable requests, answered from the response cache (hit) or not '
+    '(miss).', ('result',)
+))
+upload_bytes = REGISTRY.register(Counter(
+    'nep_upload_bytes_total', 'Bytes received in upload chunks.'
+))
+rows = REGISTRY.register(Gauge(
+    'nep_rows', 'Rows of models.', ('model',)
+))
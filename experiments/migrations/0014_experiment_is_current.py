@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 17:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def set_current_experiments(apps, schema_editor):
+    Experiment = apps.get_model('experiments', 'Experiment')
+    newer_versions = Experiment.objects.filter(
+        owner=OuterRef('owner'), nes_id=OuterRef('nes_id'),
+        version__gt=OuterRef('version')
+    )
+    current = Experiment.objects.annotate(
+        has_newer_version=Exists(newer_versions)
+    ).filter(has_newer_version=False).values('id')
+    Experiment.objects.filter(id__in=current).update(is_current=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0013_auto_20170515_1944'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='is_current',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(set_current_experiments,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:06
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max
+
+
+def create_version_counters(apps, schema_editor):
+    Experiment = apps.get_model('experiments', 'Experiment')
+    ExperimentVersionCounter = apps.get_model('experiments',
+                                              'ExperimentVersionCounter')
+    ExperimentVersionCounter.objects.bulk_create(
+        ExperimentVersionCounter(
+            owner_id=experiment['owner'], nes_id=experiment['nes_id'],
+            last_version=experiment['last_version']
+        ) for experiment in Experiment.objects.values(
+            'owner', 'nes_id'
+        ).annotate(last_version=Max('version')).order_by()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('experiments', '0014_experiment_is_current'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExperimentVersionCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nes_id', models.PositiveIntegerField()),
+                ('last_version', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='experimentversioncounter',
+            unique_together=set([('nes_id', 'owner')]),
+        ),
+        migrations.RunPython(create_version_counters,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 18:27
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import experiments.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0018_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('references', models.PositiveIntegerField(db_index=True, default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='experiment',
+            name='ethics_committee_file',
+            field=models.FileField(blank=True, storage=experiments.storage.ContentAddressedStorage(), upload_to='', verbose_name='Project file approved by the ethics committee'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0020_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableChange',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:34
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import experiments.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experiments', '0022_updated_at_no_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='experiment',
+            name='ethics_committee_file_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='experiment',
+            name='ethics_committee_file',
+            field=experiments.storage.ContentAddressedFileField(blank=True, storage=experiments.storage.ContentAddressedStorage(), upload_to='', verbose_name='Project file approved by the ethics committee'),
+        ),
+    ]
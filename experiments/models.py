@@ -1,7 +1,14 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
 from reversion.models import Revision
-import reversion
+
+from experiments.storage import ContentAddressedStorage, \
+    ContentAddressedFileField
 
 
 class Researcher(models.Model):
@@ -10,6 +17,7 @@ class Researcher(models.Model):
     email = models.EmailField(blank=True)
     nes_id = models.PositiveIntegerField()
     owner = models.ForeignKey(User)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('nes_id', 'owner')
@@ -24,6 +32,7 @@ class Study(models.Model):
     researcher = models.ForeignKey(Researcher, related_name='studies',
                                    default=None)
     owner = models.ForeignKey(User)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('nes_id', 'owner')
@@ -33,16 +42,29 @@ class ExperimentStatus(models.Model):
     tag = models.CharField(max_length=20)
     name = models.CharField(max_length=50, blank=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ExperimentQuerySet(models.QuerySet):
+
+    def current(self):
+        return self.filter(is_current=True)
+
+    def with_group_count(self):
+        return self.annotate(group_count=models.Count('groups'))
 
 
-@reversion.register()
 class Experiment(models.Model):
     title = models.CharField(max_length=150)
     description = models.TextField()
     data_acquisition_done = models.BooleanField(default=False)
-    ethics_committee_file = models.FileField(
-        'Project file approved by the ethics committee', blank=True
+    ethics_committee_file = ContentAddressedFileField(
+        'Project file approved by the ethics committee', blank=True,
+        storage=ContentAddressedStorage()
     )
+    # Name of the file uploaded, stored under its hash
+    ethics_committee_file_name = models.CharField(max_length=255,
+                                                  blank=True)
     version = models.PositiveIntegerField()
     study = models.ForeignKey(Study, related_name='experiments')
     status = models.ForeignKey(ExperimentStatus, related_name='experiments',
@@ -50,12 +72,77 @@ class Experiment(models.Model):
     # has id 1.
     nes_id = models.PositiveIntegerField()
     owner = models.ForeignKey(User)
+    # Denormalized flag pointing to the last version of the experiment. Kept
+    # up to date when new versions are saved (see save below) and when the
+    # last one is deleted (see promote_last_version); rebuild it with the
+    # rebuild_current_experiments management command.
+    is_current = models.BooleanField(default=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ExperimentQuerySet.as_manager()
 
     class Meta:
+        # Its index serves lookups of the versions of an experiment, by
+        # owner and nes_id
         unique_together = ('nes_id', 'owner', 'version')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        experiment = super().from_db(db, field_names, values)
+        if 'ethics_committee_file' in experiment.__dict__:
+            # Compared when saving, to count file references (see
+            # experiments.storage)
+            experiment._stored_file_name = \
+                experiment.ethics_committee_file.name or None
+        return experiment
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            versions = Experiment.objects.filter(
+                nes_id=self.nes_id, owner_id=self.owner_id
+            )
+            self.is_current = not versions.filter(
+                version__gt=self.version
+            ).exists()
+            if self.is_current:
+                versions.filter(is_current=True).update(
+                    is_current=False, updated_at=timezone.now()
+                )
+            super().save(*args, **kwargs)
+
+
+@receiver(post_delete, sender=Experiment)
+def promote_last_version(sender, instance, **kwargs):
+    """
+    Makes the last version left of an experiment current, when the current
+    one is deleted.
+    """
+    versions = Experiment.objects.filter(nes_id=instance.nes_id,
+                                         owner_id=instance.owner_id)
+    if versions.filter(is_current=True).exists():
+        return
+    last_version = versions.order_by('-version').values_list(
+        'id', flat=True
+    ).first()
+    if last_version is not None:
+        Experiment.objects.filter(id=last_version).update(
+            is_current=True, updated_at=timezone.now()
+        )
+
+
+class ExperimentVersionCounter(models.Model):
+    # Last version number allocated to each experiment. Versions are
+    # allocated by incrementing it (see appclasses.allocate_versions).
+    nes_id = models.PositiveIntegerField()
+    owner = models.ForeignKey(User)
+    last_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('nes_id', 'owner')
+
 
-@reversion.register()
 class ProtocolComponent(models.Model):
     identification = models.CharField(max_length=50)
     description = models.TextField(blank=True)
@@ -65,6 +152,7 @@ class ProtocolComponent(models.Model):
     experiment = models.ForeignKey(Experiment,
                                    related_name='protocol_components')
     owner = models.ForeignKey(User)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('nes_id', 'owner', 'experiment')
@@ -78,6 +166,87 @@ class Group(models.Model):
     experiment = models.ForeignKey(Experiment, related_name='groups')
     nes_id = models.PositiveIntegerField()
     owner = models.ForeignKey(User)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('nes_id', 'owner', 'experiment')
+
+
+class ChunkedUpload(models.Model):
+    """
+    File being uploaded in chunks, to be attached to an experiment when
+    complete (see experiments.uploads).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    experiment = models.ForeignKey(Experiment, related_name='uploads')
+    owner = models.ForeignKey(User)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # Number of bytes received so far; next chunk must start there
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+
+class Blob(models.Model):
+    """
+    File saved by ContentAddressedStorage, with the number of experiments
+    referencing it. Unreferenced blobs are deleted by the collect_blobs
+    management command.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=0, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TableChange(models.Model):
+    """
+    Generation of the rows of a model: random number replaced each time
+    they are changed, by caching.invalidate. ETags and cached responses are
+    derived from it.
+    """
+    model = models.CharField(max_length=100, primary_key=True)
+    generation = models.BigIntegerField(default=0)
+
+
+class Job(models.Model):
+    """
+    Background job: call of a task registered in experiments.jobs, run
+    by the run_jobs management command.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    # Task keyword arguments, JSON encoded
+    arguments = models.TextField(default='{}')
+    owner = models.ForeignKey(User, null=True, blank=True,
+                              related_name='jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    # Queued jobs are not run before, to back off after failures
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'],
+                         name='job_status_run_after'),
+        ]
@@ -0,0 +1,56 @@
+from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Pages must be taken from a stable ordering
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination: pages are fetched with "WHERE id > <cursor>" instead
+    of OFFSET, so deep pages cost as much as the first one.
+    """
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+PAGINATION_MODES = {
+    'page': PageNumberPagination,
+    'cursor': CursorPagination,
+}
+
+
+class PaginationModeMixin:
+    """
+    Lets clients choose the pagination mode of list endpoints with
+    ?pagination=page|cursor. Requests with a ?page parameter use page number
+    pagination. Otherwise the view's pagination_mode is used.
+    """
+    pagination_mode = 'cursor'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'pagination' in params:
+                mode = params['pagination']
+            elif PageNumberPagination.page_query_param in params:
+                mode = 'page'
+            else:
+                mode = self.pagination_mode
+            if mode not in PAGINATION_MODES:
+                raise ValidationError({'pagination': [
+                    'Invalid pagination mode. Choose one of: %s.' %
+                    ', '.join(sorted(PAGINATION_MODES))
+                ]})
+            self._paginator = PAGINATION_MODES[mode]()
+        return self._paginator
@@ -0,0 +1,102 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+def optimize_queryset(queryset, serializer, prefetch=()):
+    """
+    Adds to queryset the select_related and prefetch_related calls needed
+    to serialize its objects with serializer, derived from serializer
+    fields' source paths. That way listing objects takes a constant number
+    of queries instead of one or more queries by object.
+    :param queryset: queryset of serializer model objects
+    :param serializer: serializer instance
+    :param prefetch: "to one" relations to be prefetched instead of joined
+    :return: optimized queryset
+    """
+    select_related, prefetch_related = [], []
+    _collect_relations(queryset.model, serializer, '', select_related,
+                       prefetch_related)
+    for lookup in prefetch:
+        if lookup in select_related:
+            select_related.remove(lookup)
+            prefetch_related.append(lookup)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+def _collect_relations(model, serializer, prefix, select_related,
+                       prefetch_related):
+    """
+    Appends to select_related and prefetch_related the lookups needed by
+    serializer fields. Relations under a prefetched relation can't be
+    joined, so callers pass prefetch_related as select_related for them.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path, model_field = _follow_source(model, field.source_attrs)
+        if not path:
+            continue
+        lookup = prefix + path
+        related_model = model_field.related_model
+        if model_field.one_to_many or model_field.many_to_many:
+            if isinstance(field, ManyRelatedField) and \
+                    _serializes_pk_only(field.child_relation) and \
+                    model_field.one_to_many:
+                # Only primary keys are serialized, don't load whole rows
+                prefetch_related.append(Prefetch(
+                    lookup, queryset=related_model.objects.only(
+                        'pk', model_field.field.name
+                    )
+                ))
+            else:
+                prefetch_related.append(lookup)
+            if isinstance(field, serializers.BaseSerializer):
+                _collect_relations(related_model, field, lookup + '__',
+                                   prefetch_related, prefetch_related)
+        else:
+            if isinstance(field, RelatedField) and \
+                    _serializes_pk_only(field) and \
+                    len(field.source_attrs) == 1:
+                # The foreign key column is enough
+                continue
+            if lookup not in select_related:
+                select_related.append(lookup)
+            if isinstance(field, serializers.BaseSerializer):
+                _collect_relations(related_model, field, lookup + '__',
+                                   select_related, prefetch_related)
+
+
+def _follow_source(model, source_attrs):
+    """
+    Follows the relations of model named by source_attrs, stopping after
+    the first "to many" relation.
+    :return: tuple (lookup path of the relations followed, last relation
+    model field followed)
+    """
+    path, model_field = [], None
+    for attr in source_attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation:
+            break
+        path.append(attr)
+        model_field = field
+        model = field.related_model
+        if field.one_to_many or field.many_to_many:
+            break
+    return '__'.join(path), model_field
+
+
+def _serializes_pk_only(field):
+    return hasattr(field, 'use_pk_only_optimization') and \
+        field.use_pk_only_optimization()
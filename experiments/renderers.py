@@ -0,0 +1,127 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Same output as rest_framework.renderers.JSONRenderer defaults
+_encoder = encoders.JSONEncoder(ensure_ascii=False, allow_nan=False,
+                                separators=(',', ':'))
+# Line and paragraph separators are valid in JSON, not in javascript
+_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+# Written by ujson for NaN and infinities, that aren't JSON
+_NON_FINITE = (b'NaN', b'Inf')
+
+
+def _stdlib_dumps(data):
+    return _encoder.encode(data).encode('utf-8')
+
+
+def _orjson_dumps(data):
+    # Dates are left to the encoder of rest framework, that formats them
+    # differently
+    return orjson.dumps(data, default=_encoder.default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def _ujson_dumps(data):
+    content = ujson.dumps(data, ensure_ascii=False,
+                          escape_forward_slashes=False).encode('utf-8')
+    if any(token in content for token in _NON_FINITE):
+        # Maybe only in strings: json tells
+        raise ValueError('Out of range float values are not JSON compliant')
+    return content
+
+
+# JSON libraries, from the fastest, with their dumps and loads functions
+BACKENDS = (
+    ('orjson', orjson, _orjson_dumps, orjson and orjson.loads),
+    ('ujson', ujson, _ujson_dumps, ujson and ujson.loads),
+    ('json', json, _stdlib_dumps, json.loads),
+)
+
+
+def get_backend():
+    """
+    :return: tuple (name, dumps, loads) of the JSON library named by
+    settings.NEP_JSON_BACKEND, or of the fastest one installed if None
+    """
+    name = settings.NEP_JSON_BACKEND
+    for backend, module, dumps, loads in BACKENDS:
+        if backend == name or (name is None and module is not None):
+            if module is None:
+                raise ImproperlyConfigured(
+                    'NEP_JSON_BACKEND %s is not installed.' % name
+                )
+            return backend, dumps, loads
+    raise ImproperlyConfigured('Unknown NEP_JSON_BACKEND %r.' % name)
+
+
+def dumps(data):
+    """
+    Encodes data like rest framework's JSONRenderer, with the JSON library
+    of get_backend. Data fast libraries can't encode, like big integers,
+    are encoded with the json module. Differences left: floats may be
+    written in another notation of the same number (1e300 for 1e+300), and
+    orjson writes NaN and infinities as null, where the json module raises
+    ValueError.
+    :return: UTF-8 encoded JSON
+    """
+    backend, backend_dumps, _ = get_backend()
+    if backend == 'json':
+        content = _stdlib_dumps(data)
+    else:
+        try:
+            content = backend_dumps(data)
+        except (TypeError, ValueError, OverflowError):
+            content = _stdlib_dumps(data)
+    for separator, escaped in _SEPARATORS:
+        if separator in content:
+            content = content.replace(separator, escaped)
+    return content
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with dumps. Indented JSON, requested with an indent media
+    type parameter, and JSON settings other than rest framework defaults
+    are left to rest framework.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) or \
+                not self.compact or self.ensure_ascii or not self.strict:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return dumps(data)
+
+
+class JSONParser(parsers.JSONParser):
+    """
+    Parses JSON with a fast JSON library, if one is installed (see
+    get_backend).
+    """
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        backend, _, backend_loads = get_backend()
+        if backend == 'json':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return backend_loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
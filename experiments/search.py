@@ -0,0 +1,158 @@
+import re
+
+from django.db import connection
+
+# Search indexes: result type, indexed table, title column and searched
+# columns. Each is an SQLite FTS5 table holding an inverted index of the
+# indexed table rows, kept up to date by triggers.
+SEARCH_INDEXES = (
+    ('experiment', 'experiments_experiment', 'title',
+     ('title', 'description')),
+    ('study', 'experiments_study', 'title', ('title', 'description')),
+    ('protocol_component', 'experiments_protocolcomponent',
+     'identification', ('identification', 'description')),
+)
+# Weight of matches in title column relative to other columns
+TITLE_WEIGHT = 5.0
+# Shorter words are not searched as prefixes: they match too many rows to
+# rank them fast
+MIN_PREFIX_LENGTH = 3
+# Index prefixes of this length, so that the shortest prefix searches read
+# a single index entry
+INDEXED_PREFIXES = '3'
+TOKENIZER = 'unicode61 remove_diacritics 1'
+
+# Restricts results of each type to current experiment versions
+CURRENT_ONLY = {
+    'experiment': 'is_current',
+    'protocol_component': 'experiment_id IN (SELECT id FROM '
+                          'experiments_experiment WHERE is_current)',
+}
+
+
+def fts_table(table):
+    return table + '_fts'
+
+
+def install_search_indexes():
+    """
+    Creates search index tables and the triggers that keep them up to
+    date, if missing. Indexes are rebuilt when their triggers were missing:
+    SQLite drops triggers of tables remade by schema migrations.
+    Only SQLite databases are supported; does nothing with other
+    databases.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+        for _, table, _, columns in SEARCH_INDEXES:
+            fts = fts_table(table)
+            names = ['%s_%s' % (fts, event)
+                     for event in ('insert', 'delete', 'update')]
+            if all(name in triggers for name in names):
+                continue
+            for sql in index_sql(table, columns, *names):
+                cursor.execute(sql)
+            cursor.execute(
+                "INSERT INTO %s(%s) VALUES('rebuild')" % (fts, fts)
+            )
+
+
+def index_sql(table, columns, insert, delete, update):
+    """
+    Returns the statements creating the search index of table, an external
+    content FTS5 table: it holds only the inverted index, reading the
+    column values from table.
+    """
+    fts = fts_table(table)
+    names = ', '.join(columns)
+    new_values = ', '.join('new.' + column for column in columns)
+    old_values = ', '.join('old.' + column for column in columns)
+    insert_row = 'INSERT INTO %s(rowid, %s) VALUES (new.id, %s);' % (
+        fts, names, new_values
+    )
+    delete_row = "INSERT INTO %s(%s, rowid, %s) " \
+                 "VALUES ('delete', old.id, %s);" % (fts, fts, names,
+                                                     old_values)
+    return [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(%s, "
+        "content='%s', content_rowid='id', tokenize='%s', prefix='%s')" % (
+            fts, names, table, TOKENIZER, INDEXED_PREFIXES
+        ),
+        'DROP TRIGGER IF EXISTS %s' % insert,
+        'DROP TRIGGER IF EXISTS %s' % delete,
+        'DROP TRIGGER IF EXISTS %s' % update,
+        'CREATE TRIGGER %s AFTER INSERT ON %s BEGIN %s END' % (
+            insert, table, insert_row
+        ),
+        'CREATE TRIGGER %s AFTER DELETE ON %s BEGIN %s END' % (
+            delete, table, delete_row
+        ),
+        'CREATE TRIGGER %s AFTER UPDATE OF %s ON %s BEGIN %s %s END' % (
+            update, names, table, delete_row, insert_row
+        ),
+    ]
+
+
+def match_expression(query):
+    """
+    Builds an FTS5 query matching rows with all words of query, the last
+    one as a prefix of words in rows if at least MIN_PREFIX_LENGTH
+    characters long. Words are quoted, so that FTS5 operators in query
+    are searched as plain text.
+    :return: FTS5 query, or None if query has no words
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    if len(words[-1]) >= MIN_PREFIX_LENGTH:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(query, limit=20):
+    """
+    Searches experiments, studies and protocol components with query in
+    their titles or descriptions. Only current experiment versions, and
+    their protocol components, are searched.
+    :param query: words to search, the last one possibly incomplete
+    :param limit: maximum number of results
+    :return: list of dicts with type, id, nes_id and title of results,
+    best ranked first
+    """
+    match = match_expression(query)
+    if match is None:
+        return []
+    selects = []
+    params = []
+    for result_type, table, title, columns in SEARCH_INDEXES:
+        fts = fts_table(table)
+        weights = ', '.join(
+            str(TITLE_WEIGHT) if column == title else '1.0'
+            for column in columns
+        )
+        where = '%s MATCH %%s' % fts
+        if result_type in CURRENT_ONLY:
+            where += ' AND t.' + CURRENT_ONLY[result_type]
+        # Each search index answers its best matches; results are then
+        # merged by rank
+        selects.append(
+            "SELECT * FROM (SELECT '%s' AS type, t.id, t.nes_id, t.%s AS "
+            "title, bm25(%s, %s) AS score FROM %s JOIN %s t "
+            "ON t.id = %s.rowid WHERE %s ORDER BY score LIMIT %%s)" % (
+                result_type, title, fts, weights, fts, table, fts, where
+            )
+        )
+        params.extend([match, limit])
+    sql = ' UNION ALL '.join(selects) + ' ORDER BY score, type, id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {'type': row[0], 'id': row[1], 'nes_id': row[2],
+             'title': row[3]}
+            for row in cursor.fetchall()
+        ]
@@ -0,0 +1,140 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils.deconstruct import deconstructible
+
+# Directory, under the storage location, of content addressed files
+BLOBS_DIR = 'blobs'
+MAX_EXTENSION_LENGTH = 10
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage saving files by content: files are named by their
+    sha256 hash, so a file saved again with the same content is stored
+    only once, under the same name. Names keep the extension of the file
+    name, for web servers to serve files with their content types.
+    Files are not deleted when no longer referenced: see Blob and the
+    collect_blobs management command.
+    Blob references are counted by the signal receivers below. Experiments
+    created or changed with bulk_create or update() are not counted:
+    collect_blobs recounts references before deleting blobs.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Files are named by content in _save, never renamed. Django asks
+        # for another name when the file was created since _save checked it
+        # exists: by a concurrent save of the same content.
+        if name.startswith(BLOBS_DIR + '/') and self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        blob_name = self.blob_name(name, content)
+        if self.exists(blob_name):
+            return blob_name
+        try:
+            return super()._save(blob_name, content)
+        except FileExistsError:
+            # Already stored: references are counted by the receivers below
+            return blob_name
+
+    @staticmethod
+    def blob_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        if len(extension) > MAX_EXTENSION_LENGTH:
+            extension = ''
+        return '/'.join((BLOBS_DIR, sha256[:2], sha256 + extension))
+
+
+class NamedFieldFile(FieldFile):
+    """
+    File of a ContentAddressedFileField. Saving it keeps the name it is
+    given in the <field name>_name field of the instance, stored names
+    being hashes.
+    """
+
+    def save(self, name, content, save=True):
+        setattr(self.instance, '%s_name' % self.field.name,
+                os.path.basename(name))
+        super().save(name, content, save)
+
+
+class ContentAddressedFileField(models.FileField):
+    """
+    FileField of ContentAddressedStorage files, keeping the names files
+    are saved with (see NamedFieldFile), for downloads.
+    """
+    attr_class = NamedFieldFile
+
+
+def stored_file_name(experiment):
+    """
+    :return: name of the ethics committee file of experiment in database
+    """
+    if '_stored_file_name' in experiment.__dict__:
+        return experiment._stored_file_name
+    return type(experiment).objects.filter(pk=experiment.pk).values_list(
+        'ethics_committee_file', flat=True
+    ).first() or None
+
+
+def add_reference(name, storage):
+    """
+    Counts a new reference to the file name in storage.
+    """
+    from experiments.models import Blob
+    updated = Blob.objects.filter(name=name).update(
+        references=F('references') + 1
+    )
+    if not updated:
+        Blob.objects.get_or_create(
+            name=name, defaults={'size': storage.size(name), 'references': 0}
+        )
+        Blob.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def remove_reference(name):
+    from experiments.models import Blob
+    Blob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+
+
+@receiver(pre_save, sender='experiments.Experiment')
+def read_stored_file_name(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._stored_file_name = stored_file_name(instance)
+
+
+@receiver(post_save, sender='experiments.Experiment')
+def count_file_references(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_name = None if created else instance._stored_file_name
+    new_name = instance.ethics_committee_file.name or None
+    if new_name != old_name:
+        if new_name:
+            add_reference(new_name, instance.ethics_committee_file.storage)
+        if old_name:
+            remove_reference(old_name)
+    instance._stored_file_name = new_name
+
+
+@receiver(post_delete, sender='experiments.Experiment')
+def uncount_file_references(sender, instance, **kwargs):
+    if instance.ethics_committee_file.name:
+        remove_reference(instance.ethics_committee_file.name)
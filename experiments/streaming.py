@@ -0,0 +1,85 @@
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from experiments.renderers import dumps
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders newline delimited JSON: one JSON object by line. Paginated
+    responses render only their results.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'results' in data:
+            data = data['results']
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(dumps(item) + b'\n' for item in data)
+
+
+class StreamingListMixin:
+    """
+    Lets clients stream the whole list of objects in one response, with
+    ?stream=1 (a JSON array) or by accepting application/x-ndjson (one
+    object by line). Objects are fetched, serialized and sent in chunks of
+    stream_chunk_size objects ordered by pk, so memory use doesn't depend on
+    the number of objects and the first bytes are sent right away.
+    """
+    stream_chunk_size = 500
+    renderer_classes = \
+        list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer]
+
+    def list(self, request, *args, **kwargs):
+        ndjson = isinstance(request.accepted_renderer, NDJSONRenderer)
+        if not ndjson and request.query_params.get('stream') not in \
+                ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if ndjson:
+            content = self.stream_ndjson(queryset)
+            content_type = NDJSONRenderer.media_type
+        else:
+            content = self.stream_json(queryset)
+            content_type = 'application/json'
+        return StreamingHttpResponse(content, content_type=content_type)
+
+    def iter_chunks(self, queryset):
+        """
+        Yields lists of serialized objects of queryset. Chunks are fetched
+        by primary key ranges rather than with queryset.iterator(), so
+        prefetch_related lookups still apply to each chunk.
+        """
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            chunk = queryset
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            chunk = list(chunk[:self.stream_chunk_size])
+            if not chunk:
+                return
+            # Rows of values querysets are dicts (see experiments.values)
+            last = chunk[-1]
+            last_pk = last['pk'] if isinstance(last, dict) else last.pk
+            yield self.get_serializer(chunk, many=True).data
+
+    def stream_json(self, queryset):
+        yield b'['
+        separator = b''
+        for chunk in self.iter_chunks(queryset):
+            # Chunks are encoded at once, without their brackets
+            yield separator + dumps(chunk)[1:-1]
+            separator = b','
+        yield b']'
+
+    def stream_ndjson(self, queryset):
+        for chunk in self.iter_chunks(queryset):
+            yield b''.join(dumps(item) + b'\n' for item in chunk)
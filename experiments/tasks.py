@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from experiments.jobs import task, PermanentJobError
+from experiments.models import Experiment
+from experiments.storage import BLOBS_DIR
+from experiments.uploads import BLOCK_SIZE
+
+# PDF files start with this header, and end with an end of file marker in
+# their last bytes
+PDF_HEADER = b'%PDF-'
+PDF_EOF = b'%%EOF'
+PDF_TRAILER_SIZE = 1024
+
+
+@task()
+def check_ethics_committee_file(experiment_id):
+    """
+    Checks that the ethics committee file of the experiment is a complete
+    PDF, and that content addressed files still have the content they are
+    named by.
+    """
+    experiment = Experiment.objects.filter(id=experiment_id).only(
+        'ethics_committee_file'
+    ).first()
+    if experiment is None or not experiment.ethics_committee_file:
+        return
+    name = experiment.ethics_committee_file.name
+    digest = hashlib.sha256()
+    trailer = b''
+    with experiment.ethics_committee_file.storage.open(name) as file:
+        header = file.read(len(PDF_HEADER))
+        digest.update(header)
+        for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+            digest.update(block)
+            trailer = (trailer + block)[-PDF_TRAILER_SIZE:]
+    if header != PDF_HEADER:
+        raise PermanentJobError('%s is not a PDF file.' % name)
+    if PDF_EOF not in trailer:
+        raise PermanentJobError('%s is a truncated PDF file.' % name)
+    if name.startswith(BLOBS_DIR + '/') and digest.hexdigest() != \
+            os.path.splitext(os.path.basename(name))[0]:
+        raise PermanentJobError('%s content does not match its checksum.' %
+                                name)
@@ -1,15 +1,23 @@
 import io
+import threading
+from unittest import mock
 
 from PIL import Image
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIClient
 from datetime import datetime
 import json
 
 from reversion.models import Version
 
+from experiments import api
+from experiments.bulk import BulkCreateMixin
+from experiments.caching import invalidate
 from experiments.models import Experiment, Researcher, Study, \
     ProtocolComponent, ExperimentStatus, Group
 
@@ -61,7 +69,7 @@ class ResearcherAPITest(APITestCase):
         researcher2 = Researcher.objects.create(nes_id=2, owner=owner)
         response = self.client.get(self.list_url)
         self.assertEqual(
-            json.loads(response.content.decode('utf8')),
+            json.loads(response.content.decode('utf8'))['results'],
             [
                 {
                     'id': researcher1.id,
@@ -187,7 +195,7 @@ class StudyAPITest(APITestCase):
         study2 = create_study(nes_id=2, owner=owner)
         response = self.client.get(self.list_url)
         self.assertEqual(
-            json.loads(response.content.decode('utf8')),
+            json.loads(response.content.decode('utf8'))['results'],
             [
                 {
                     'id': study1.id,
@@ -338,7 +346,7 @@ class ExperimentAPITest(APITestCase):
         experiment2 = create_experiment(nes_id=2, owner=owner, version=1)
         response = self.client.get(self.list_url)
         self.assertEqual(
-            json.loads(response.content.decode('utf8')),
+            json.loads(response.content.decode('utf8'))['results'],
             [
                 {
                     'id': experiment1.id,
@@ -389,6 +397,11 @@ class ExperimentAPITest(APITestCase):
         self.client.logout()
         new_experiment = Experiment.objects.first()
         self.assertEqual(new_experiment.title, 'New experiment')
+        # Files are stored by content, their names are kept for downloads
+        self.assertEqual(new_experiment.ethics_committee_file_name,
+                         'test.png')
+        self.assertNotIn(new_experiment.ethics_committee_file_name,
+                         new_experiment.ethics_committee_file.name)
 
     def test_POSTing_experiment_generates_new_version(self):
         owner = User.objects.create_user(username='lab1', password='nep-lab1')
@@ -573,7 +586,7 @@ class ProtocolComponentAPITest(APITestCase):
         )
         response = self.client.get(self.list_url)
         self.assertEqual(
-            json.loads(response.content.decode('utf8')),
+            json.loads(response.content.decode('utf8'))['results'],
             [
                 {
                     'id': protocol_component1.id,
@@ -764,7 +777,7 @@ class GroupAPITest(APITestCase):
                            kwargs={'nes_id': experiment.nes_id})
         response = self.client.get(list_url)
         self.assertEqual(
-            json.loads(response.content.decode('utf8')),
+            json.loads(response.content.decode('utf8'))['results'],
             [
                 {
                     'id': group1.id,
@@ -824,3 +837,606 @@ class GroupAPITest(APITestCase):
         self.client.logout()
         new_group = Group.objects.first()
         self.assertEqual(new_group.experiment.id, experiment_v2.id)
+
+
+class PaginationAPITest(APITestCase):
+
+    def test_experiments_are_paginated_by_cursor_by_default(self):
+        owner = User.objects.create_user(username='lab1')
+        experiments = [create_experiment(nes_id=nes_id, owner=owner,
+                                         version=1)
+                       for nes_id in range(1, 6)]
+        response = self.client.get(reverse('api_experiments-list'),
+                                   {'page_size': 2})
+        page = json.loads(response.content.decode('utf8'))
+        self.assertNotIn('count', page)
+        self.assertIn('cursor=', page['next'])
+        ids = [experiment['id'] for experiment in page['results']]
+        while page['next']:
+            page = json.loads(
+                self.client.get(page['next']).content.decode('utf8')
+            )
+            ids += [experiment['id'] for experiment in page['results']]
+        self.assertEqual(ids, [experiment.id for experiment in experiments])
+
+    def test_researchers_are_paginated_by_page_number_by_default(self):
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in range(1, 4):
+            Researcher.objects.create(nes_id=nes_id, owner=owner)
+        response = self.client.get(reverse('api_researchers-list'),
+                                   {'page_size': 2, 'page': 2})
+        page = json.loads(response.content.decode('utf8'))
+        self.assertEqual(page['count'], 3)
+        self.assertEqual(len(page['results']), 1)
+
+    def test_client_chooses_pagination_mode(self):
+        owner = User.objects.create_user(username='lab1')
+        create_experiment(nes_id=1, owner=owner, version=1)
+        response = self.client.get(reverse('api_experiments-list'),
+                                   {'pagination': 'page'})
+        page = json.loads(response.content.decode('utf8'))
+        self.assertEqual(page['count'], 1)
+
+    def test_invalid_pagination_mode_is_bad_request(self):
+        response = self.client.get(reverse('api_experiments-list'),
+                                   {'pagination': 'offset'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FilteringAPITest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1')
+        self.other_owner = User.objects.create_user(username='lab2')
+        self.experiment_v1 = create_experiment(nes_id=1, owner=self.owner,
+                                               version=1)
+        self.experiment_v2 = create_experiment(nes_id=1, owner=self.owner,
+                                               version=2)
+        self.other_experiment = create_experiment(
+            nes_id=1, owner=self.other_owner, version=1
+        )
+
+    def get_ids(self, url, data):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['id'] for result in
+                json.loads(response.content.decode('utf8'))['results']]
+
+    def test_filters_experiments_by_owner(self):
+        self.assertEqual(
+            self.get_ids(self.list_url, {'owner': 'lab1'}),
+            [self.experiment_v1.id, self.experiment_v2.id]
+        )
+
+    def test_filters_current_experiment_versions(self):
+        self.assertEqual(
+            self.get_ids(self.list_url,
+                         {'owner': 'lab1', 'current_only': 'true'}),
+            [self.experiment_v2.id]
+        )
+        self.assertEqual(
+            len(self.get_ids(self.list_url, {'current_only': 'false'})), 3
+        )
+
+    def test_filters_experiments_by_status_and_data_acquisition(self):
+        approved = ExperimentStatus.objects.create(tag='approved')
+        self.experiment_v1.status = approved
+        self.experiment_v1.data_acquisition_done = True
+        self.experiment_v1.save()
+        self.assertEqual(
+            self.get_ids(self.list_url, {'status': 'approved'}),
+            [self.experiment_v1.id]
+        )
+        self.assertEqual(
+            self.get_ids(self.list_url, {'data_acquisition_done': 'false'}),
+            [self.experiment_v2.id, self.other_experiment.id]
+        )
+
+    def test_filters_experiments_by_study(self):
+        self.assertEqual(
+            self.get_ids(self.list_url,
+                         {'study': self.experiment_v2.study.nes_id}),
+            [self.experiment_v2.id]
+        )
+
+    def test_orders_experiments(self):
+        self.assertEqual(
+            self.get_ids(self.list_url,
+                         {'owner': 'lab1', 'ordering': '-version'}),
+            [self.experiment_v2.id, self.experiment_v1.id]
+        )
+
+    def test_cursor_pages_follow_ordering(self):
+        response = self.client.get(self.list_url,
+                                   {'ordering': '-id', 'page_size': 2})
+        page = json.loads(response.content.decode('utf8'))
+        ids = [result['id'] for result in page['results']]
+        page = json.loads(
+            self.client.get(page['next']).content.decode('utf8')
+        )
+        ids += [result['id'] for result in page['results']]
+        self.assertEqual(ids, [self.other_experiment.id,
+                               self.experiment_v2.id, self.experiment_v1.id])
+
+    def test_filters_protocol_components_of_current_experiments(self):
+        for experiment in (self.experiment_v1, self.experiment_v2):
+            ProtocolComponent.objects.create(
+                identification='An identification',
+                component_type='A component type', nes_id=1,
+                experiment=experiment, owner=self.owner
+            )
+        ids = self.get_ids(reverse('api_protocol_components-list'),
+                           {'experiment': 1, 'current_only': 'true'})
+        self.assertEqual(
+            ids, list(self.experiment_v2.protocol_components.values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_invalid_filter_values_are_bad_request(self):
+        response = self.client.get(
+            self.list_url, {'version': 'last', 'current_only': 'maybe'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sorted(json.loads(response.content.decode('utf8'))),
+            ['current_only', 'version']
+        )
+
+
+class DynamicFieldsAPITest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1')
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=1)
+        self.protocol_component = ProtocolComponent.objects.create(
+            identification='An identification',
+            component_type='A component type', nes_id=1,
+            experiment=self.experiment, owner=self.owner
+        )
+
+    def get_results(self, data, url=list_url):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content.decode('utf8'))['results']
+
+    def test_serializes_requested_fields_only(self):
+        self.assertEqual(self.get_results({'fields': 'id,title'}), [{
+            'id': self.experiment.id, 'title': self.experiment.title
+        }])
+
+    def test_excluded_relations_are_not_fetched(self):
+        # ETag and experiments
+        with self.assertNumQueries(2):
+            self.get_results({'fields': 'id,title'})
+
+    def test_expands_relations(self):
+        results = self.get_results({
+            'fields': 'id', 'expand': 'study,protocol_components'
+        })
+        study = self.experiment.study
+        self.assertEqual(results[0]['study']['id'], study.id)
+        self.assertEqual(results[0]['study']['experiments'],
+                         [self.experiment.id])
+        self.assertEqual(
+            [protocol_component['identification'] for protocol_component
+             in results[0]['protocol_components']],
+            ['An identification']
+        )
+
+    def test_expanded_relations_are_prefetched(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.get_results({'expand': 'study,protocol_components'})
+            return len(context.captured_queries)
+
+        num_queries = count_queries()
+        for nes_id in range(2, 5):
+            create_experiment(nes_id=nes_id, owner=self.owner, version=1)
+        self.assertEqual(count_queries(), num_queries)
+
+    def test_expands_experiment_of_groups(self):
+        Group.objects.create(title='A title', description='A description',
+                             nes_id=1, experiment=self.experiment,
+                             owner=self.owner)
+        results = self.get_results(
+            {'fields': 'title', 'expand': 'experiment'},
+            reverse('api_groups-list', kwargs={'nes_id': 1})
+        )
+        self.assertEqual(results[0]['experiment']['id'], self.experiment.id)
+
+    def test_unknown_fields_are_bad_request(self):
+        for data in ({'fields': 'id,colour'}, {'expand': 'owner'}):
+            response = self.client.get(self.list_url, data)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+
+class ExperimentTreeAPITest(APITestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        self.experiment_v1 = create_experiment(nes_id=1, owner=self.owner,
+                                               version=1)
+        self.experiment_v2 = Experiment.objects.create(
+            nes_id=1, title='Our title', description='Our description',
+            study=self.experiment_v1.study, owner=self.owner, version=2
+        )
+        self.nes_id = 0
+
+    def add_children(self, experiment):
+        self.nes_id += 1
+        ProtocolComponent.objects.create(
+            identification='An identification',
+            component_type='A component type', nes_id=self.nes_id,
+            experiment=experiment, owner=self.owner
+        )
+        Group.objects.create(title='A title', description='A description',
+                             nes_id=self.nes_id, experiment=experiment,
+                             owner=self.owner)
+
+    def get_tree(self, data=None, nes_id=1):
+        return self.client.get(
+            reverse('api_experiments-tree', kwargs={'nes_id': nes_id}), data
+        )
+
+    def test_nests_versions_under_study_and_researcher(self):
+        self.add_children(self.experiment_v2)
+        response = self.get_tree({'owner': 'lab1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        researchers = json.loads(response.content.decode('utf8'))[
+            'researchers'
+        ]
+        study = self.experiment_v1.study
+        self.assertEqual([researcher['id'] for researcher in researchers],
+                         [study.researcher.id])
+        studies = researchers[0]['studies']
+        self.assertEqual([study['id'] for study in studies], [study.id])
+        experiments = studies[0]['experiments']
+        self.assertEqual(
+            [(experiment['id'], experiment['version'])
+             for experiment in experiments],
+            [(self.experiment_v1.id, 1), (self.experiment_v2.id, 2)]
+        )
+        self.assertEqual(experiments[0]['protocol_components'], [])
+        self.assertEqual(
+            [protocol_component['nes_id'] for protocol_component
+             in experiments[1]['protocol_components']], [1]
+        )
+        self.assertEqual(
+            [group['title'] for group in experiments[1]['groups']],
+            ['A title']
+        )
+
+    def test_defaults_to_experiments_of_logged_user(self):
+        self.client.login(username=self.owner.username, password='nep-lab1')
+        self.assertEqual(self.get_tree().status_code, status.HTTP_200_OK)
+        self.client.logout()
+        self.assertEqual(self.get_tree().status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_experiment_is_not_found(self):
+        response = self.get_tree({'owner': 'lab1'}, nes_id=2)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_number_of_queries_does_not_depend_on_tree_size(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.get_tree({'owner': 'lab1'}).status_code,
+                                 status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        self.add_children(self.experiment_v1)
+        num_queries = count_queries()
+        for i in range(3):
+            self.add_children(self.experiment_v1)
+            self.add_children(self.experiment_v2)
+        create_experiment(nes_id=1, owner=self.owner, version=3)
+        self.assertEqual(count_queries(), num_queries)
+        # ETag, experiments with studies and researchers, statuses,
+        # protocol components and groups
+        self.assertEqual(num_queries, 5)
+
+
+class ListQueryCountAPITest(APITestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1')
+        self.nes_id = 0
+
+    def create_experiment_tree(self):
+        """
+        Creates an experiment with its study, researcher, protocol
+        components and groups.
+        """
+        self.nes_id += 1
+        experiment = create_experiment(nes_id=self.nes_id, owner=self.owner,
+                                       version=1)
+        for nes_id in (1, 2):
+            ProtocolComponent.objects.create(
+                identification='An identification',
+                component_type='A component type', nes_id=nes_id,
+                experiment=experiment, owner=self.owner
+            )
+            Group.objects.create(
+                title='A title', description='A description', nes_id=nes_id,
+                experiment=experiment, owner=self.owner
+            )
+        return experiment
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, num):
+        self.create_experiment_tree()
+        self.assertEqual(self.count_queries(url), num)
+        for i in range(5):
+            self.create_experiment_tree()
+        self.assertEqual(self.count_queries(url), num)
+
+    # Every list also runs one query to compute its ETag
+
+    def test_researchers_list(self):
+        # count, researchers, studies
+        self.assertConstantQueries(reverse('api_researchers-list'), 4)
+
+    def test_studies_list(self):
+        # count, studies with researchers and owners, experiments
+        self.assertConstantQueries(reverse('api_studies-list'), 4)
+
+    def test_experiments_list(self):
+        # experiments with studies and owners, statuses, protocol components
+        self.assertConstantQueries(reverse('api_experiments-list'), 4)
+
+    def test_protocol_components_list(self):
+        self.assertConstantQueries(
+            reverse('api_protocol_components-list'), 2
+        )
+
+    def test_groups_list(self):
+        self.assertConstantQueries(
+            reverse('api_groups-list', kwargs={'nes_id': 1}), 2
+        )
+
+
+class StreamingAPITest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def setUp(self):
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in range(1, 8):
+            create_experiment(nes_id=nes_id, owner=owner, version=1)
+        self.expected = json.loads(self.client.get(
+            self.list_url, {'page_size': 100}
+        ).content.decode('utf8'))['results']
+
+    def test_streams_json_array_of_all_experiments(self):
+        with mock.patch.object(api.ExperimentViewSet, 'stream_chunk_size',
+                               3):
+            response = self.client.get(self.list_url, {'stream': 1})
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content.decode('utf8')), self.expected)
+
+    def test_streams_ndjson_when_accepted(self):
+        response = self.client.get(self.list_url,
+                                   HTTP_ACCEPT='application/x-ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf8')
+        self.assertEqual(
+            [json.loads(line) for line in lines.splitlines()], self.expected
+        )
+
+    def test_streaming_empty_list(self):
+        Experiment.objects.all().delete()
+        response = self.client.get(self.list_url, {'stream': 1})
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+
+class BulkCreateAPITest(APITestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        self.client.login(username=self.owner.username, password='nep-lab1')
+
+    def post_bulk(self, url, items):
+        response = self.client.post(url, items, format='json')
+        return response.status_code, \
+            json.loads(response.content.decode('utf8'))
+
+    def test_bulk_creates_researchers_reporting_duplicates(self):
+        Researcher.objects.create(nes_id=1, owner=self.owner)
+        status_code, content = self.post_bulk(
+            reverse('api_researchers-bulk'),
+            [{'nes_id': 1}, {'nes_id': 2, 'first_name': 'João'},
+             {'nes_id': 2}, {'first_name': 'No nes_id'}, {'nes_id': 3}]
+        )
+        self.assertEqual(status_code, status.HTTP_201_CREATED)
+        self.assertEqual(content['created'], 2)
+        self.assertEqual([error['index'] for error in content['errors']],
+                         [0, 2, 3])
+        self.assertEqual(
+            set(Researcher.objects.values_list('nes_id', 'first_name')),
+            {(1, ''), (2, 'João'), (3, '')}
+        )
+
+    def test_bulk_creates_studies(self):
+        researcher = Researcher.objects.create(nes_id=1, owner=self.owner)
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        status_code, content = self.post_bulk(
+            reverse('api_studies-bulk'),
+            [{'title': 'Study %d' % nes_id, 'description': 'Description',
+              'start_date': today, 'nes_id': nes_id,
+              'researcher': researcher.id} for nes_id in (1, 2)] +
+            [{'title': 'Study', 'description': 'Description',
+              'start_date': today, 'nes_id': 3, 'researcher': 999}]
+        )
+        self.assertEqual(content['created'], 2)
+        self.assertEqual(content['errors'], [{
+            'index': 2,
+            'errors': {'researcher': ['Invalid pk "999" - object does not '
+                                      'exist.']}
+        }])
+        self.assertEqual(researcher.studies.count(), 2)
+
+    def test_bulk_creates_experiment_versions(self):
+        study = create_study(nes_id=1, owner=self.owner)
+        create_experiment(nes_id=1, owner=self.owner, version=1)
+        status_code, content = self.post_bulk(
+            reverse('api_experiments-bulk'),
+            [{'title': 'Title', 'description': 'Description', 'nes_id': 1,
+              'study': study.id},
+             {'title': 'Title', 'description': 'Description', 'nes_id': 2,
+              'study': study.id},
+             {'title': 'Title', 'description': 'Description', 'nes_id': 1,
+              'study': study.id}]
+        )
+        self.assertEqual(content, {'created': 3, 'errors': []})
+        self.assertEqual(
+            list(Experiment.objects.current().order_by('nes_id').values_list(
+                'nes_id', 'version')),
+            [(1, 3), (2, 1)]
+        )
+        self.assertEqual(Experiment.objects.count(), 4)
+
+    def test_bulk_creates_protocol_components_for_current_experiment(self):
+        create_experiment(nes_id=1, owner=self.owner, version=1)
+        experiment_v2 = create_experiment(nes_id=1, owner=self.owner,
+                                          version=2)
+        status_code, content = self.post_bulk(
+            reverse('api_protocol_components-bulk'),
+            [{'identification': 'Identification %d' % nes_id,
+              'component_type': 'A component type', 'nes_id': nes_id,
+              'experiment': 1} for nes_id in (1, 2, 2)]
+        )
+        self.assertEqual(content['created'], 2)
+        self.assertEqual(content['errors'][0]['index'], 2)
+        self.assertEqual(experiment_v2.protocol_components.count(), 2)
+
+    def test_bulk_creates_groups_of_url_experiment(self):
+        experiment = create_experiment(nes_id=1, owner=self.owner, version=1)
+        status_code, content = self.post_bulk(
+            reverse('api_groups-bulk', kwargs={'nes_id': 1}),
+            [{'title': 'Group %d' % nes_id, 'description': 'Description',
+              'nes_id': nes_id} for nes_id in range(1, 11)]
+        )
+        self.assertEqual(content['created'], 10)
+        self.assertEqual(experiment.groups.count(), 10)
+
+    def test_bulk_create_query_count_does_not_depend_on_items(self):
+        # Researcher changes are counted from now on
+        invalidate(Researcher)
+        for number in (10, 100):
+            with CaptureQueriesContext(connection) as context:
+                status_code, content = self.post_bulk(
+                    reverse('api_researchers-bulk'),
+                    [{'nes_id': number + nes_id} for nes_id in range(number)]
+                )
+            self.assertEqual(content['created'], number)
+            # session, user, existing researchers, savepoint, insert,
+            # release savepoint, generation
+            self.assertEqual(len(context.captured_queries), 7)
+
+    def test_bulk_creates_objects_of_the_serializer_model_by_default(self):
+        with mock.patch.object(api.ResearcherViewSet, 'get_bulk_objects',
+                               BulkCreateMixin.get_bulk_objects):
+            status_code, content = self.post_bulk(
+                reverse('api_researchers-bulk'),
+                [{'nes_id': 1, 'first_name': 'João'}, {'nes_id': 2}]
+            )
+        self.assertEqual(status_code, status.HTTP_201_CREATED)
+        self.assertEqual(content, {'created': 2, 'errors': []})
+        self.assertEqual(
+            list(Researcher.objects.order_by('nes_id').values_list(
+                'nes_id', 'first_name', 'owner'
+            )),
+            [(1, 'João', self.owner.id), (2, '', self.owner.id)]
+        )
+
+    def test_bulk_create_requires_list(self):
+        status_code, content = self.post_bulk(
+            reverse('api_researchers-bulk'), {'nes_id': 1}
+        )
+        self.assertEqual(status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_requires_authentication(self):
+        self.client.logout()
+        status_code, content = self.post_bulk(
+            reverse('api_researchers-bulk'), [{'nes_id': 1}]
+        )
+        self.assertEqual(status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ExperimentVersionAllocationAPITest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def test_allocation_recovers_from_versions_saved_without_counter(self):
+        owner = User.objects.create_user(username='lab1', password='nep-lab1')
+        study = create_study(nes_id=1, owner=owner)
+        self.client.login(username=owner.username, password='nep-lab1')
+        data = {'title': 'New experiment', 'description': 'Some description',
+                'nes_id': 1, 'study': study.id}
+        self.client.post(self.list_url, data)
+        # Version 2 is saved without going through the counter
+        create_experiment(nes_id=1, owner=owner, version=2)
+        response = self.client.post(self.list_url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(Experiment.objects.current().values_list('version',
+                                                          flat=True)),
+            [3]
+        )
+
+
+class ConcurrentExperimentVersionAllocationTest(TransactionTestCase):
+
+    def setUp(self):
+        # Connections to a shared in-memory SQLite database fail right away
+        # on locks instead of waiting for them
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('requires a database accepting concurrent '
+                          'connections')
+
+    def test_parallel_creates_get_distinct_versions(self):
+        owner = User.objects.create_user(username='lab1', password='nep-lab1')
+        study = create_study(nes_id=1, owner=owner)
+        responses = []
+
+        def post_experiment():
+            client = APIClient()
+            client.login(username=owner.username, password='nep-lab1')
+            responses.append(client.post(
+                reverse('api_experiments-list'),
+                {'title': 'New experiment', 'description': 'Description',
+                 'nes_id': 1, 'study': study.id}
+            ))
+            connection.close()
+
+        threads = [threading.Thread(target=post_experiment)
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses],
+                         [status.HTTP_201_CREATED] * 8)
+        self.assertEqual(
+            sorted(Experiment.objects.values_list('version', flat=True)),
+            list(range(1, 9))
+        )
+        self.assertEqual(
+            list(Experiment.objects.current().values_list('version',
+                                                          flat=True)),
+            [8]
+        )
@@ -0,0 +1,221 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments.models import Group, Experiment, ProtocolComponent, \
+    ExperimentVersionCounter, TableChange
+from experiments.tests.test_api import create_experiment
+
+
+@override_settings(NEP_RESPONSE_CACHE_TIMEOUT=60)
+class ResponseCacheTest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=1)
+
+    def get_results(self, url, data=None):
+        response = self.client.get(url, data)
+        return json.loads(response.content.decode('utf8'))['results']
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        results = self.get_results(self.list_url)
+        # Generations only
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_results(self.list_url), results)
+
+    def test_query_parameters_are_part_of_the_cache_key(self):
+        create_experiment(nes_id=2, owner=self.owner, version=1)
+        self.assertEqual(len(self.get_results(self.list_url)), 2)
+        self.assertEqual(
+            len(self.get_results(self.list_url, {'page_size': 1})), 1
+        )
+
+    def test_saving_rows_invalidates_cached_responses(self):
+        self.get_results(self.list_url)
+        self.experiment.title = 'Changed title'
+        self.experiment.save()
+        self.assertEqual(self.get_results(self.list_url)[0]['title'],
+                         'Changed title')
+
+    def test_saving_related_rows_invalidates_cached_responses(self):
+        self.get_results(self.list_url)
+        study = self.experiment.study
+        study.title = 'Changed title'
+        study.save()
+        self.assertEqual(self.get_results(self.list_url)[0]['study'],
+                         'Changed title')
+
+    def test_deleting_rows_invalidates_cached_responses(self):
+        self.get_results(self.list_url)
+        self.experiment.delete()
+        self.assertEqual(self.get_results(self.list_url), [])
+
+    def test_bulk_create_invalidates_cached_responses(self):
+        self.get_results(self.list_url)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+        self.client.post(
+            reverse('api_experiments-bulk'),
+            [{'title': 'Title', 'description': 'Description', 'nes_id': 2,
+              'study': self.experiment.study.id}],
+            format='json'
+        )
+        self.client.logout()
+        self.assertEqual(len(self.get_results(self.list_url)), 2)
+
+    def test_authenticated_reads_are_not_cached(self):
+        self.get_results(self.list_url)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+        # session, user, ETag, experiments, statuses and protocol components
+        with self.assertNumQueries(6):
+            self.client.get(self.list_url)
+
+    def test_home_page_is_cached_until_groups_change(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
+        Group.objects.create(title='A title', description='A description',
+                             nes_id=1, experiment=self.experiment,
+                             owner=self.owner)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(
+            response.context['experiments'][0].group_count, 1
+        )
+
+    def test_expanded_responses_are_invalidated_by_expanded_rows(self):
+        url = reverse('api_protocol_components-list')
+        ProtocolComponent.objects.create(
+            identification='An identification', component_type='type',
+            nes_id=1, experiment=self.experiment, owner=self.owner
+        )
+        self.get_results(url, {'expand': 'experiment'})
+        status = self.experiment.status
+        status.tag = 'approved'
+        status.save()
+        results = self.get_results(url, {'expand': 'experiment'})
+        self.assertEqual(results[0]['experiment']['status'], 'approved')
+
+        url = reverse('api_researchers-list')
+        self.get_results(url, {'expand': 'studies'})
+        Experiment.objects.create(
+            nes_id=2, version=1, title='Title', description='Description',
+            study=self.experiment.study, owner=self.owner, status=status
+        )
+        results = self.get_results(url, {'expand': 'studies'})
+        self.assertEqual(len(results[0]['studies'][0]['experiments']), 2)
+
+
+class ConditionalGetTest(APITestCase):
+    list_url = reverse('api_experiments-list')
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=1)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_list_answers_not_modified(self):
+        etag = self.get_etag(self.list_url)
+        # ETag only, nothing serialized
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_saving_rows_changes_etag(self):
+        etag = self.get_etag(self.list_url)
+        self.experiment.title = 'Changed title'
+        self.experiment.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deleting_rows_changes_etag(self):
+        create_experiment(nes_id=2, owner=self.owner, version=1)
+        etag = self.get_etag(self.list_url)
+        self.experiment.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renaming_users_changes_etag(self):
+        etag = self.get_etag(self.list_url)
+        self.owner.username = 'renamed'
+        self.owner.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content.decode('utf8'))['results'][0]['owner'],
+            'renamed'
+        )
+
+    def test_logins_dont_change_etag(self):
+        etag = self.get_etag(self.list_url)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+        self.client.logout()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_of_models_not_cached_are_not_counted(self):
+        ExperimentVersionCounter.objects.create(nes_id=1, owner=self.owner)
+        self.assertEqual(
+            list(TableChange.objects.order_by('model').values_list(
+                'model', flat=True
+            )),
+            ['auth.user', 'experiments.experiment',
+             'experiments.experimentstatus', 'experiments.researcher',
+             'experiments.study']
+        )
+
+    def test_etag_is_read_without_scanning_tables(self):
+        etag = self.get_etag(self.list_url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotIn('COUNT(', context.captured_queries[0]['sql'])
+
+    def test_etag_depends_on_query_parameters_and_user(self):
+        etag = self.get_etag(self.list_url)
+        self.assertNotEqual(self.get_etag(self.list_url + '?page_size=1'),
+                            etag)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+
+    def test_unchanged_home_page_answers_not_modified(self):
+        etag = self.get_etag(reverse('home'))
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Group.objects.create(title='A title', description='A description',
+                             nes_id=1, experiment=self.experiment,
+                             owner=self.owner)
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(NEP_RESPONSE_CACHE_TIMEOUT=60)
+class CachedConditionalGetTest(APITestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        owner = User.objects.create_user(username='lab1')
+        create_experiment(nes_id=1, owner=owner, version=1)
+
+    def test_cached_responses_answer_not_modified(self):
+        url = reverse('api_experiments-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from experiments.downloads import parse_range
+from experiments.tests.test_api import create_experiment
+
+CONTENT = b'%PDF-1.4 ethics committee approval'
+
+
+class ParseRangeTest(SimpleTestCase):
+
+    def test_parses_single_byte_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 10))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 10))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 10))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 10))
+
+    def test_ignores_other_ranges(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('lines=0-1', 100))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertIs(parse_range('bytes=100-', 100), False)
+        self.assertIs(parse_range('bytes=-0', 100), False)
+
+
+class ExperimentFileAPITest(APITestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root,
+                                           NEP_SENDFILE_HEADER=None)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        owner = User.objects.create_user(username='lab1')
+        self.experiment_v1 = create_experiment(nes_id=1, owner=owner,
+                                               version=1)
+        self.experiment_v1.ethics_committee_file.save(
+            'approval.pdf', ContentFile(b'first version')
+        )
+        self.experiment_v2 = create_experiment(nes_id=1, owner=owner,
+                                               version=2)
+        self.experiment_v2.ethics_committee_file.save(
+            'approval.pdf', ContentFile(CONTENT)
+        )
+        self.url = reverse('api_experiments-file', kwargs={'nes_id': 1})
+
+    def download(self, data=None, **headers):
+        data = dict(data or {}, owner='lab1')
+        return self.client.get(self.url, data, **headers)
+
+    def test_downloads_current_version_file(self):
+        response = self.download(HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_downloads_file_with_its_uploaded_name(self):
+        response = self.download()
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="approval.pdf"')
+        self.experiment_v2.ethics_committee_file.save(
+            'Aprovação "final".pdf', ContentFile(CONTENT)
+        )
+        response = self.download()
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="Aprovao final.pdf"; '
+            "filename*=UTF-8''Aprova%C3%A7%C3%A3o%20%22final%22.pdf"
+        )
+
+    def test_downloads_file_of_given_version(self):
+        response = self.download({'version': 1})
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'first version')
+
+    def test_experiments_without_file_are_not_found(self):
+        self.experiment_v2.ethics_committee_file = ''
+        self.experiment_v2.save()
+        self.assertEqual(self.download().status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_serves_byte_ranges(self):
+        response = self.download(HTTP_RANGE='bytes=4-7')
+        self.assertEqual(response.status_code,
+                         status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[4:8])
+        self.assertEqual(response['Content-Range'],
+                         'bytes 4-7/%d' % len(CONTENT))
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_unsatisfiable_range(self):
+        response = self.download(HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code,
+                         status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'],
+                         'bytes */%d' % len(CONTENT))
+
+    def test_if_range_with_other_etag_sends_whole_file(self):
+        response = self.download(HTTP_RANGE='bytes=4-7',
+                                 HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_conditional_requests(self):
+        response = self.download()
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        response.close()
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(
+            self.download(HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(
+            self.download(HTTP_IF_MATCH='"other"').status_code,
+            status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertEqual(
+            self.download(HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_delegates_transfer_with_x_accel_redirect(self):
+        with override_settings(NEP_SENDFILE_HEADER='X-Accel-Redirect',
+                               NEP_SENDFILE_URL='/protected-media/'):
+            response = self.download()
+        name = self.experiment_v2.ethics_committee_file.name
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/' + name)
+        self.assertEqual(response.content, b'')
+
+    def test_delegates_transfer_with_x_sendfile(self):
+        with override_settings(NEP_SENDFILE_HEADER='X-Sendfile'):
+            response = self.download()
+        self.assertEqual(response['X-Sendfile'],
+                         self.experiment_v2.ethics_committee_file.path)
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments.instrumentation import RequestMetrics, timer, \
+    current_metrics
+from experiments.management.commands.request_stats import histogram
+from experiments.tests.test_api import create_experiment
+
+
+@override_settings(NEP_INSTRUMENTATION=True, NEP_RESPONSE_CACHE_TIMEOUT=0)
+class InstrumentationMiddlewareTest(APITestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in (1, 2, 3):
+            create_experiment(nes_id, owner, 1)
+
+    def get(self, url, **kwargs):
+        with self.assertLogs('experiments.instrumentation') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(len(logs.records), 1)
+        return response, json.loads(logs.records[0].getMessage()), \
+            len(queries)
+
+    def test_measures_requests(self):
+        response, data, queries = self.get(reverse('api_experiments-list'))
+        self.assertEqual(data['route'], 'api_experiments-list')
+        self.assertEqual(data['method'], 'GET')
+        self.assertEqual(data['status'], 200)
+        self.assertEqual(data['queries'], queries)
+        for name in ('db_ms', 'serialize_ms', 'render_ms', 'total_ms'):
+            self.assertGreaterEqual(data[name], 0)
+        self.assertIsNone(data['peak_memory'])
+        server_timing = response['Server-Timing']
+        self.assertIn('db;dur=', server_timing)
+        self.assertIn('desc="%d queries"' % queries, server_timing)
+        for name in ('serialize', 'render', 'total'):
+            self.assertIn('%s;dur=' % name, server_timing)
+
+    def test_serializers_are_timed(self):
+        with override_settings(NEP_VALUES_LISTS=False):
+            _, data, _ = self.get(reverse('api_experiments-list'))
+        self.assertIn('serialize_ms', data)
+
+    def test_measures_streamed_responses_until_sent(self):
+        response, data, queries = self.get(reverse('api_experiments-list'),
+                                           data={'stream': 1})
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(data['queries'], queries)
+        self.assertIn('serialize_ms', data)
+
+    def test_measures_unresolved_requests(self):
+        response, data, _ = self.get('/no/such/page/')
+        self.assertEqual(data['status'], 404)
+        self.assertIsNone(data['route'])
+
+    @override_settings(NEP_INSTRUMENTATION_MEMORY=True)
+    def test_measures_peak_memory(self):
+        response, data, _ = self.get(reverse('api_experiments-list'))
+        self.assertGreater(data['peak_memory'], 0)
+        self.assertIn('memory;desc=', response['Server-Timing'])
+
+    @override_settings(NEP_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('api_experiments-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIsNone(current_metrics())
+
+
+class TimerTest(SimpleTestCase):
+
+    def test_nested_blocks_are_counted_once(self):
+        metrics = RequestMetrics()
+        metrics.start()
+        try:
+            with timer('serialize'):
+                with timer('serialize'):
+                    pass
+            self.assertEqual(list(metrics.timings), ['serialize'])
+        finally:
+            metrics.stop()
+        self.assertIsNone(current_metrics())
+
+    def test_without_request(self):
+        with timer('serialize'):
+            pass
+
+
+class RequestStatsCommandTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log = os.path.join(directory, 'requests.log')
+        lines = ['Starting server', '{"not": "a request"}']
+        for total_ms, queries in ((10, 2), (20, 2), (300, 40)):
+            lines.append('INFO ' + json.dumps({
+                'method': 'GET', 'route': 'api_experiments-list',
+                'total_ms': total_ms, 'queries': queries, 'db_ms': 5,
+            }))
+        lines.append(json.dumps({'method': 'GET', 'route': None,
+                                 'total_ms': 1, 'queries': 0}))
+        with open(self.log, 'w') as log:
+            log.write('\n'.join(lines))
+
+    def test_aggregates_routes(self):
+        out = StringIO()
+        call_command('request_stats', self.log, histogram=True, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            lines[1].split(),
+            ['GET', 'api_experiments-list', '3', '20.0', '300.0', '300.0',
+             '14.7', '5.0']
+        )
+        self.assertTrue(lines[2].startswith('GET (unresolved)'))
+        self.assertIn('    <= 10 ms        1 ' + '#' * 40, lines)
+
+    def test_histogram(self):
+        self.assertEqual(histogram([1, 10, 11, 20000]),
+                         [2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1])
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from experiments.jobs import task, enqueue, claim_job, run_pending_jobs, \
+    requeue_stale_jobs, PermanentJobError
+from experiments.models import Job
+from experiments.tests.test_api import create_experiment
+
+PDF = b'%PDF-1.4 ethics committee approval\n%%EOF\n'
+
+calls = []
+
+
+@task(name='test_record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='test_fail', max_attempts=2)
+def fail():
+    raise ConnectionError('Service unavailable')
+
+
+@task(name='test_fail_permanently')
+def fail_permanently():
+    raise PermanentJobError('Invalid file')
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        del calls[:]
+
+    def due(self, job):
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+
+    def test_runs_queued_jobs(self):
+        job = enqueue('test_record', value=1)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [1])
+        self.assertEqual(run_pending_jobs(), 0)
+
+    def test_failed_jobs_are_retried_with_back_off(self):
+        job = enqueue('test_fail')
+        with self.assertLogs('experiments.jobs', 'WARNING'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.last_error,
+                         'ConnectionError: Service unavailable')
+        self.assertGreater(job.run_after, timezone.now())
+        # Not due before its retry delay
+        self.assertEqual(run_pending_jobs(), 0)
+        self.due(job)
+        with self.assertLogs('experiments.jobs', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        job = enqueue('test_fail_permanently')
+        with self.assertLogs('experiments.jobs', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.last_error, 'PermanentJobError: Invalid file')
+
+    def test_jobs_are_rolled_back_with_their_transaction(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            enqueue('test_record', value=1)
+            raise ValueError
+        self.assertFalse(Job.objects.exists())
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        job = enqueue('test_record', value=1)
+        self.assertEqual(claim_job().id, job.id)
+        self.assertIsNone(claim_job())
+
+    def test_stale_jobs_are_queued_again(self):
+        job = enqueue('test_record', value=1)
+        claim_job()
+        self.assertEqual(requeue_stale_jobs(60), 0)
+        Job.objects.filter(id=job.id).update(
+            started_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertEqual(requeue_stale_jobs(60), 1)
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_run_jobs_command(self):
+        enqueue('test_record', value=1)
+        enqueue('test_record', value=2)
+        out = StringIO()
+        call_command('run_jobs', once=True, stdout=out)
+        self.assertEqual(calls, [1, 2])
+        self.assertIn('2 jobs run.', out.getvalue())
+
+
+class CheckEthicsCommitteeFileTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.experiment = create_experiment(
+            nes_id=1, owner=User.objects.create_user(username='lab1'),
+            version=1
+        )
+
+    def attach_file(self, content):
+        self.experiment.ethics_committee_file.save('approval.pdf',
+                                                   ContentFile(content))
+
+    def check(self):
+        job = enqueue('check_ethics_committee_file',
+                      experiment_id=self.experiment.id)
+        run_pending_jobs()
+        job.refresh_from_db()
+        return job
+
+    def assert_check_fails(self, message):
+        with self.assertLogs('experiments.jobs', 'ERROR'):
+            job = self.check()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn(message, job.last_error)
+
+    def test_accepts_pdf_files(self):
+        self.attach_file(PDF)
+        self.assertEqual(self.check().status, Job.DONE)
+
+    def test_rejects_other_files(self):
+        self.attach_file(b'ethics committee approval')
+        self.assert_check_fails('is not a PDF file')
+        self.attach_file(PDF[:20])
+        self.assert_check_fails('is a truncated PDF file')
+
+    def test_rejects_files_changed_on_disk(self):
+        self.attach_file(PDF)
+        with open(self.experiment.ethics_committee_file.path, 'ab') as file:
+            file.write(b'%%EOF\n')
+        self.assert_check_fails('does not match its checksum')
+
+
+class JobAPITest(APITestCase):
+    list_url = reverse('api_jobs-list')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=1)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+
+    def upload(self, content):
+        response = self.client.post(
+            reverse('api_uploads-list'),
+            {'experiment': 1, 'filename': 'approval.pdf',
+             'size': len(content)}
+        )
+        upload_id = json.loads(response.content.decode('utf8'))['id']
+        self.client.put(
+            reverse('api_uploads-chunk', kwargs={'pk': upload_id}), content,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes 0-%d/%d' % (len(content) - 1,
+                                                  len(content))
+        )
+        response = self.client.post(
+            reverse('api_uploads-finalize', kwargs={'pk': upload_id}),
+            {'sha256': hashlib.sha256(content).hexdigest()}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def get_jobs(self, data=None):
+        response = self.client.get(self.list_url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content.decode('utf8'))['results']
+
+    def test_finalized_uploads_queue_file_checks(self):
+        self.upload(PDF)
+        jobs = self.get_jobs()
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0]['name'], 'check_ethics_committee_file')
+        self.assertEqual(jobs[0]['status'], Job.QUEUED)
+        run_pending_jobs()
+        self.assertEqual(self.get_jobs({'status': 'done'})[0]['id'],
+                         jobs[0]['id'])
+        self.assertEqual(self.get_jobs({'status': 'failed'}), [])
+
+    def test_lists_jobs_of_logged_user_only(self):
+        enqueue('check_ethics_committee_file',
+                owner=User.objects.create_user(username='lab2'),
+                experiment_id=self.experiment.id)
+        self.assertEqual(self.get_jobs(), [])
+        self.client.logout()
+        self.assertEqual(self.client.get(self.list_url).status_code,
+                         status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments import metrics
+from experiments.tests.test_api import create_experiment
+
+
+class MetricsTest(SimpleTestCase):
+
+    def test_renders_histograms(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('view',),
+                                      buckets=(0.1, 1))
+        histogram.observe(0.05, view='a "b"')
+        histogram.observe(1, view='a "b"')
+        histogram.observe(2, view='a "b"')
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a \\"b\\"",le="0.1"} 1',
+            'test_seconds_bucket{view="a \\"b\\"",le="1.0"} 2',
+            'test_seconds_bucket{view="a \\"b\\"",le="+Inf"} 3',
+            'test_seconds_sum{view="a \\"b\\""} 3.05',
+            'test_seconds_count{view="a \\"b\\""} 3',
+        ])
+
+    def test_renders_counters(self):
+        counter = metrics.Counter('test_total', 'Test.')
+        counter.inc()
+        counter.inc(2)
+        self.assertEqual(counter.render()[2], 'test_total 3')
+
+    def test_rejects_unknown_labels(self):
+        counter = metrics.Counter('test_total', 'Test.', ('view',))
+        with self.assertRaises(ValueError):
+            counter.inc(action='list')
+
+
+@override_settings(NEP_METRICS=True, NEP_RESPONSE_CACHE_TIMEOUT=60)
+class MetricsViewTest(APITestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        metrics.REGISTRY.clear()
+        self.addCleanup(metrics.REGISTRY.clear)
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in (1, 2):
+            create_experiment(nes_id, owner, 1)
+
+    def get_metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode('utf-8').splitlines()
+
+    def test_exports_request_metrics(self):
+        self.client.get(reverse('api_experiments-list'))
+        self.client.get(reverse('api_experiments-list'))
+        self.client.get(reverse('api_studies-list'))
+        lines = self.get_metrics()
+        self.assertIn('nep_http_requests_total{view="ExperimentViewSet",'
+                      'action="list",method="GET",status="200"} 2', lines)
+        self.assertIn('nep_http_requests_total{view="StudyViewSet",'
+                      'action="list",method="GET",status="200"} 1', lines)
+        self.assertIn('nep_http_request_duration_seconds_count{'
+                      'view="ExperimentViewSet",action="list"} 2', lines)
+        self.assertIn('nep_http_request_queries_count{'
+                      'view="ExperimentViewSet",action="list"} 2', lines)
+        # The second list is cached
+        self.assertIn('nep_response_cache_requests_total{result="miss"} 2',
+                      lines)
+        self.assertIn('nep_response_cache_requests_total{result="hit"} 1',
+                      lines)
+
+    def test_exports_row_counts(self):
+        lines = self.get_metrics()
+        self.assertIn('nep_rows{model="experiment"} 2', lines)
+        self.assertIn('nep_rows{model="study"} 2', lines)
+        self.assertIn('nep_rows{model="protocolcomponent"} 0', lines)
+        self.assertIn('nep_rows{model="group"} 0', lines)
+
+    def test_function_views(self):
+        self.client.get(reverse('home'))
+        self.assertIn('nep_http_requests_total{view="home_page",'
+                      'action="get",method="GET",status="200"} 1',
+                      self.get_metrics())
+
+    @override_settings(NEP_METRICS=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
@@ -1,5 +1,8 @@
+import io
+
 from django.test import TestCase
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.contrib.auth.models import User
 from datetime import datetime
 
@@ -199,6 +202,70 @@ class ExperimentModelTest(TestCase):
         self.assertIn(experiment, owner.experiment_set.all())
         self.assertIn(experiment, status.experiments.all())
 
+    def test_new_version_becomes_the_current_one(self):
+        owner = User.objects.create(username='lab2')
+        study = create_study(nes_id=1, owner=owner)
+        experiment_v1 = Experiment.objects.create(
+            nes_id=1, study=study, owner=owner, version=1
+        )
+        self.assertTrue(experiment_v1.is_current)
+        experiment_v2 = Experiment.objects.create(
+            nes_id=1, study=study, owner=owner, version=2
+        )
+        experiment_v1.refresh_from_db()
+        self.assertFalse(experiment_v1.is_current)
+        self.assertTrue(experiment_v2.is_current)
+
+    def test_saving_older_version_keeps_current_one(self):
+        owner = User.objects.create(username='lab2')
+        study = create_study(nes_id=1, owner=owner)
+        experiment_v2 = Experiment.objects.create(
+            nes_id=1, study=study, owner=owner, version=2
+        )
+        experiment_v1 = Experiment.objects.create(
+            nes_id=1, study=study, owner=owner, version=1
+        )
+        experiment_v2.refresh_from_db()
+        self.assertTrue(experiment_v2.is_current)
+        self.assertFalse(experiment_v1.is_current)
+
+    def test_deleting_current_version_makes_last_version_left_current(self):
+        owner = User.objects.create(username='lab2')
+        study = create_study(nes_id=1, owner=owner)
+        experiments = [
+            Experiment.objects.create(nes_id=1, study=study, owner=owner,
+                                      version=version)
+            for version in (1, 2, 3)
+        ]
+        experiments[2].delete()
+        self.assertEqual(
+            list(Experiment.objects.current().values_list('version',
+                                                          flat=True)),
+            [2]
+        )
+        # Deleting other versions keeps the current one
+        experiments[0].delete()
+        self.assertEqual(
+            list(Experiment.objects.current().values_list('version',
+                                                          flat=True)),
+            [2]
+        )
+
+    def test_rebuild_current_experiments_command(self):
+        owner = User.objects.create(username='lab2')
+        study = create_study(nes_id=1, owner=owner)
+        Experiment.objects.bulk_create([
+            Experiment(nes_id=1, study=study, owner=owner, version=version)
+            for version in (1, 2, 3)
+        ])
+        self.assertFalse(Experiment.objects.filter(is_current=True).exists())
+        call_command('rebuild_current_experiments', stdout=io.StringIO())
+        self.assertEqual(
+            list(Experiment.objects.filter(is_current=True).values_list(
+                'version', flat=True)),
+            [3]
+        )
+
 
 class ProtocolComponentModelTest(TestCase):
 
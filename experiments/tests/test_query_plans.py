@@ -0,0 +1,154 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments.models import ProtocolComponent, Researcher
+from experiments.tests.test_api import create_experiment
+
+
+def full_table_scans(queries, allowed=()):
+    """
+    Runs EXPLAIN QUERY PLAN for queries and returns the plan steps that
+    read whole tables, covering indexes included: they grow with the table.
+    :param queries: list of queries captured with CaptureQueriesContext
+    :param allowed: sequence of tuples (sql, plan step) of scans accepted,
+    sql being a fragment of the queries they are accepted in
+    :return: list of tuples (sql, plan step)
+    """
+    scans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') and \
+                    not sql.startswith('UPDATE'):
+                continue
+            # Captured sql has the parameters interpolated
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            for row in cursor.fetchall():
+                step = row[-1]
+                # SELECTs without FROM scan a single constant row
+                if step == 'SCAN CONSTANT ROW':
+                    continue
+                if not step.startswith('SCAN'):
+                    continue
+                if not any(fragment in sql and step == allowed_step
+                           for fragment, allowed_step in allowed):
+                    scans.append((sql, step))
+    return scans
+
+
+@skipUnless(connection.vendor == 'sqlite', 'uses SQLite query plans')
+class HotQueriesUseIndexesTest(APITestCase):
+    """
+    Requests to the endpoints below filter their tables by the request
+    parameters, so none of their queries should read a whole table.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        # Tables are not ANALYZEd: without statistics the query planner
+        # uses an index whenever there's one matching the query
+        other_owner = User.objects.create_user(username='lab2')
+        for nes_id in range(1, 4):
+            create_experiment(nes_id=nes_id, owner=other_owner, version=1)
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=1)
+        ProtocolComponent.objects.create(
+            identification='An identification',
+            component_type='A component type', nes_id=1,
+            experiment=self.experiment, owner=self.owner
+        )
+        self.client.login(username=self.owner.username, password='nep-lab1')
+
+    def assertNoFullTableScans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertEqual(full_table_scans(context.captured_queries), [])
+
+    def test_full_table_scans_are_detected(self):
+        with CaptureQueriesContext(connection) as context:
+            list(Researcher.objects.filter(first_name='João'))
+        self.assertEqual(len(full_table_scans(context.captured_queries)), 1)
+
+    def test_allowed_scans_are_only_accepted_in_their_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            list(Researcher.objects.filter(first_name='João'))
+            list(Researcher.objects.filter(surname='Silva'))
+        # Plan steps are worded differently by SQLite versions
+        step = full_table_scans(context.captured_queries)[0][1]
+        scans = full_table_scans(context.captured_queries,
+                                 allowed=[('"first_name" = ', step)])
+        self.assertEqual(len(scans), 1)
+        self.assertIn('"surname" = ', scans[0][0])
+
+    def test_researcher_detail(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_researchers-detail',
+                           kwargs={'nes_id': self.experiment.study.nes_id})
+        )
+
+    def test_study_detail(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_studies-detail',
+                           kwargs={'nes_id': self.experiment.study.nes_id})
+        )
+
+    def test_experiment_detail(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_experiments-detail', kwargs={'nes_id': 1})
+        )
+
+    def test_protocol_component_detail(self):
+        self.assertNoFullTableScans(
+            'get',
+            reverse('api_protocol_components-detail', kwargs={'nes_id': 1})
+        )
+
+    def test_experiment_create(self):
+        self.assertNoFullTableScans(
+            'post', reverse('api_experiments-list'),
+            {'title': 'New version', 'description': 'Description',
+             'nes_id': 1, 'study': self.experiment.study_id}
+        )
+
+    def test_group_create(self):
+        self.assertNoFullTableScans(
+            'post', reverse('api_groups-list', kwargs={'nes_id': 1}),
+            {'title': 'A title', 'description': 'A description',
+             'experiment': 1, 'nes_id': 1}
+        )
+
+    def test_protocol_component_create(self):
+        self.assertNoFullTableScans(
+            'post', reverse('api_protocol_components-list'),
+            {'identification': 'An identification',
+             'component_type': 'A component type', 'nes_id': 2,
+             'experiment': 1}
+        )
+
+    def test_experiments_list_filtered_by_owner(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_experiments-list'),
+            {'owner': 'lab1', 'current_only': 'true'}
+        )
+
+    def test_experiment_versions_list(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_experiments-list'),
+            {'owner': 'lab1', 'nes_id': 1, 'ordering': '-version'}
+        )
+
+    def test_protocol_components_list_filtered_by_experiment(self):
+        self.assertNoFullTableScans(
+            'get', reverse('api_protocol_components-list'),
+            {'owner': 'lab1', 'experiment': 1}
+        )
+
+    def test_home_page(self):
+        self.assertNoFullTableScans('get', reverse('home'))
@@ -0,0 +1,93 @@
+import json
+import uuid
+from collections import OrderedDict
+from datetime import datetime, date
+from decimal import Decimal
+from unittest import skipIf
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework import renderers
+
+from experiments.renderers import JSONRenderer, dumps, orjson, ujson
+
+DATA = [
+    OrderedDict([
+        ('id', 1), ('title', 'Ação — 実験'), ('done', False),
+        ('file', None), ('components', [1, 2, 3]), ('ratio', 0.1),
+        ('url', 'http://testserver/media/a.pdf'),
+        ('text', 'line\u2028paragraph\u2029 "quoted" \\ </script>'),
+    ]),
+    {
+        'created': datetime(2017, 5, 15, 13, 45, tzinfo=timezone.utc),
+        'day': date(2017, 5, 15), 'amount': Decimal('1.50'),
+        'uuid': uuid.UUID(int=1), 'big': 2 ** 70,
+    },
+]
+
+
+class DumpsTest(SimpleTestCase):
+
+    def assert_same_as_rest_framework(self, backend):
+        with override_settings(NEP_JSON_BACKEND=backend):
+            self.assertEqual(dumps(DATA),
+                             renderers.JSONRenderer().render(DATA))
+
+    def test_json_backend(self):
+        self.assert_same_as_rest_framework('json')
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_backend(self):
+        self.assert_same_as_rest_framework('orjson')
+
+    @skipIf(ujson is None, 'ujson is not installed')
+    def test_ujson_backend(self):
+        self.assert_same_as_rest_framework('ujson')
+
+    def assert_same_floats_as_rest_framework(self, backend):
+        data = [0.1, -0.0, 1e300, 1e-05, 2.5, Decimal('1.50')]
+        with override_settings(NEP_JSON_BACKEND=backend):
+            self.assertEqual(
+                json.loads(dumps(data).decode('utf-8')),
+                json.loads(renderers.JSONRenderer().render(data)
+                           .decode('utf-8'))
+            )
+
+    def assert_rejects_non_finite_floats(self, backend):
+        with override_settings(NEP_JSON_BACKEND=backend):
+            for value in (float('nan'), float('inf'), -float('inf')):
+                with self.assertRaises(ValueError):
+                    dumps({'value': value})
+            # Not in strings
+            self.assertEqual(dumps(['NaN', 'Infinity']),
+                             b'["NaN","Infinity"]')
+
+    def test_json_floats(self):
+        self.assert_same_floats_as_rest_framework('json')
+        self.assert_rejects_non_finite_floats('json')
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_floats(self):
+        self.assert_same_floats_as_rest_framework('orjson')
+        # orjson has no option to reject them
+        with override_settings(NEP_JSON_BACKEND='orjson'):
+            self.assertEqual(dumps([float('nan'), float('inf')]),
+                             b'[null,null]')
+
+    @skipIf(ujson is None, 'ujson is not installed')
+    def test_ujson_floats(self):
+        self.assert_same_floats_as_rest_framework('ujson')
+        self.assert_rejects_non_finite_floats('ujson')
+
+    def test_unknown_backend(self):
+        with override_settings(NEP_JSON_BACKEND='simplejson'), \
+                self.assertRaises(ImproperlyConfigured):
+            dumps(DATA)
+
+    def test_indented_json_is_rendered_by_rest_framework(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            JSONRenderer().render(DATA, media_type),
+            renderers.JSONRenderer().render(DATA, media_type)
+        )
@@ -0,0 +1,162 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments.models import Experiment, ProtocolComponent
+from experiments.search import search, install_search_indexes
+from experiments.tests.test_models import create_study
+from experiments.tests.test_views import create_experiment_versions
+
+
+def search_titles(query, limit=20):
+    return [result['title'] for result in search(query, limit)]
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='lab1')
+        self.study = create_study(nes_id=1, owner=self.owner)
+        self.nes_id = 0
+
+    def create_experiment(self, title, description='Description'):
+        self.nes_id += 1
+        return Experiment.objects.create(
+            nes_id=self.nes_id, title=title, description=description,
+            study=self.study, owner=self.owner, version=1
+        )
+
+    def test_finds_experiments_by_title_and_description(self):
+        self.create_experiment('Visual attention')
+        self.create_experiment('Motor control', 'Attention to movement')
+        self.create_experiment('Motor learning')
+        self.assertEqual(sorted(search_titles('attention')),
+                         ['Motor control', 'Visual attention'])
+
+    def test_ranks_title_matches_first(self):
+        self.create_experiment('Motor control', 'Attention to movement')
+        self.create_experiment('Visual attention')
+        self.assertEqual(search_titles('attention'),
+                         ['Visual attention', 'Motor control'])
+
+    def test_matches_last_word_as_prefix(self):
+        self.create_experiment('Electroencephalography of sleep')
+        self.assertEqual(search_titles('sleep electro'),
+                         ['Electroencephalography of sleep'])
+        self.assertEqual(search_titles('electroencephalography sle'),
+                         ['Electroencephalography of sleep'])
+        self.assertEqual(search_titles('electro sleep'), [])
+        self.assertEqual(search_titles('el'), [])
+
+    def test_ignores_case_and_accents(self):
+        self.create_experiment('Estimulação magnética')
+        self.assertEqual(search_titles('ESTIMULACAO'),
+                         ['Estimulação magnética'])
+
+    def test_searches_fts_operators_as_text(self):
+        self.create_experiment('Reaching AND grasping')
+        self.assertEqual(search_titles('"reaching" AND (grasp*'),
+                         ['Reaching AND grasping'])
+        self.assertEqual(search_titles('*'), [])
+
+    def test_searches_current_experiment_versions_only(self):
+        experiment_v1, experiment_v2 = create_experiment_versions(
+            2, self.owner, [1, 2]
+        )
+        ProtocolComponent.objects.create(
+            identification='Stimulus', component_type='stimulus', nes_id=1,
+            experiment=experiment_v1, owner=self.owner
+        )
+        ProtocolComponent.objects.create(
+            identification='Stimulus', component_type='stimulus', nes_id=1,
+            experiment=experiment_v2, owner=self.owner
+        )
+        self.assertEqual(
+            [(result['type'], result['id'])
+             for result in search('title')],
+            [('experiment', experiment_v2.id)]
+        )
+        self.assertEqual(
+            [(result['type'], result['nes_id'])
+             for result in search('stimulus')],
+            [('protocol_component', 1)]
+        )
+
+    def test_finds_studies(self):
+        self.study.title = 'Sleep deprivation'
+        self.study.save()
+        self.assertEqual(search('deprivation'), [{
+            'type': 'study', 'id': self.study.id, 'nes_id': 1,
+            'title': 'Sleep deprivation'
+        }])
+
+    def test_index_follows_updates_and_deletes(self):
+        experiment = self.create_experiment('Visual attention')
+        experiment.title = 'Auditory attention'
+        experiment.save()
+        self.assertEqual(search_titles('visual'), [])
+        self.assertEqual(search_titles('auditory'), ['Auditory attention'])
+        experiment.delete()
+        self.assertEqual(search_titles('attention'), [])
+
+    def test_index_follows_bulk_creates(self):
+        Experiment.objects.bulk_create([
+            Experiment(nes_id=nes_id, title='Bulk %d' % nes_id,
+                       description='Description', study=self.study,
+                       owner=self.owner, version=1, is_current=True)
+            for nes_id in range(1, 4)
+        ])
+        self.assertEqual(len(search('bulk')), 3)
+
+    def test_limits_number_of_results(self):
+        for i in range(5):
+            self.create_experiment('Attention %d' % i)
+        self.assertEqual(len(search('attention', limit=3)), 3)
+
+    def test_no_words_finds_nothing(self):
+        self.create_experiment('Visual attention')
+        self.assertEqual(search(''), [])
+        self.assertEqual(search(' - '), [])
+
+    def test_reinstalls_dropped_triggers_and_rebuilds_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DROP TRIGGER experiments_experiment_fts_insert'
+            )
+        self.create_experiment('Visual attention')
+        self.assertEqual(search_titles('visual'), [])
+        install_search_indexes()
+        self.assertEqual(search_titles('visual'), ['Visual attention'])
+
+
+class SearchAPITest(APITestCase):
+    search_url = reverse('api_search')
+
+    def setUp(self):
+        owner = User.objects.create_user(username='lab1')
+        study = create_study(nes_id=1, owner=owner)
+        Experiment.objects.create(
+            nes_id=1, title='Visual attention', description='Description',
+            study=study, owner=owner, version=1
+        )
+
+    def test_returns_ranked_results(self):
+        response = self.client.get(self.search_url, {'q': 'visu'})
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content.decode('utf8'))['results']
+        self.assertEqual([result['title'] for result in results],
+                         ['Visual attention'])
+
+    def test_validates_limit(self):
+        response = self.client.get(self.search_url,
+                                   {'q': 'visual', 'limit': 1000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_box_submits_to_search_api(self):
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'action="%s"' % self.search_url)
+        self.assertContains(response, 'name="q"')
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from experiments.models import Blob, Experiment
+from experiments.storage import ContentAddressedStorage
+from experiments.tests.test_api import create_experiment
+
+CONTENT = b'%PDF-1.4 ethics committee approval'
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.owner = User.objects.create_user(username='lab1')
+        self.experiment_v1 = create_experiment(nes_id=1, owner=self.owner,
+                                               version=1)
+        self.experiment_v2 = create_experiment(nes_id=1, owner=self.owner,
+                                               version=2)
+
+    def attach_file(self, experiment, content=CONTENT, name='approval.pdf'):
+        experiment.ethics_committee_file.save(name, ContentFile(content))
+        return experiment.ethics_committee_file.name
+
+    def blob_files(self):
+        return [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(self.media_root)
+            for name in names
+        ]
+
+    def references(self, name):
+        return Blob.objects.get(name=name).references
+
+    def test_same_content_is_stored_once(self):
+        name = self.attach_file(self.experiment_v1)
+        self.assertEqual(self.attach_file(self.experiment_v2,
+                                          name='copy.PDF'), name)
+        self.assertTrue(name.startswith('blobs/'))
+        self.assertTrue(name.endswith('.pdf'))
+        self.assertEqual(len(self.blob_files()), 1)
+        self.assertEqual(self.references(name), 2)
+        with Experiment.objects.get(
+                id=self.experiment_v2.id).ethics_committee_file as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    def test_replacing_and_deleting_files_updates_references(self):
+        name = self.attach_file(self.experiment_v1)
+        self.attach_file(self.experiment_v2)
+        other_name = self.attach_file(self.experiment_v1, b'other content')
+        self.assertEqual(self.references(name), 1)
+        self.assertEqual(self.references(other_name), 1)
+        Experiment.objects.get(id=self.experiment_v2.id).delete()
+        self.assertEqual(self.references(name), 0)
+
+    def test_saving_other_fields_keeps_references(self):
+        name = self.attach_file(self.experiment_v1)
+        experiment = Experiment.objects.get(id=self.experiment_v1.id)
+        experiment.title = 'New title'
+        experiment.save()
+        self.assertEqual(self.references(name), 1)
+
+    def test_blob_stored_concurrently_is_reused(self):
+        storage = self.experiment_v1.ethics_committee_file.storage
+        name = storage.blob_name('approval.pdf', ContentFile(CONTENT))
+        exists = storage.exists
+        calls = []
+
+        def racing_exists(name):
+            # The blob is stored by another request right after _save
+            # checked it doesn't exist
+            calls.append(name)
+            self.assertLess(len(calls), 10, 'Saving the blob loops')
+            if len(calls) == 1:
+                os.makedirs(os.path.dirname(storage.path(name)))
+                with open(storage.path(name), 'wb') as file:
+                    file.write(CONTENT)
+                return False
+            return exists(name)
+
+        with mock.patch.object(ContentAddressedStorage, 'exists',
+                               side_effect=racing_exists):
+            self.assertEqual(self.attach_file(self.experiment_v1), name)
+        self.assertEqual(self.references(name), 1)
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_collect_blobs_deletes_unreferenced_files(self):
+        name = self.attach_file(self.experiment_v1)
+        other_name = self.attach_file(self.experiment_v2, b'other content')
+        Experiment.objects.filter(id=self.experiment_v2.id).update(
+            ethics_committee_file=''
+        )
+        call_command('collect_blobs', stdout=StringIO())
+        self.assertEqual(list(Blob.objects.values_list('name', flat=True)),
+                         [name])
+        self.assertFalse(
+            Experiment.ethics_committee_file.field.storage.exists(other_name)
+        )
+        self.assertEqual(len(self.blob_files()), 1)
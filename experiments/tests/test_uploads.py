@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from experiments import metrics
+from experiments.models import ChunkedUpload, Experiment
+from experiments.tests.test_api import create_experiment
+from experiments.uploads import partial_path
+
+CONTENT = b'%PDF-1.4 ethics committee approval'
+
+
+class ChunkedUploadAPITest(APITestCase):
+    list_url = reverse('api_uploads-list')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        create_experiment(nes_id=1, owner=self.owner, version=1)
+        self.experiment = create_experiment(nes_id=1, owner=self.owner,
+                                            version=2)
+        self.client.login(username=self.owner.username, password='nep-lab1')
+
+    def start_upload(self, size=len(CONTENT)):
+        response = self.client.post(
+            self.list_url,
+            {'experiment': 1, 'filename': 'approval.pdf', 'size': size}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED,
+                         response.content)
+        return json.loads(response.content.decode('utf8'))['id']
+
+    def put_chunk(self, upload_id, start, chunk, size=len(CONTENT)):
+        return self.client.put(
+            reverse('api_uploads-chunk', kwargs={'pk': upload_id}), chunk,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes %d-%d/%d' % (
+                start, start + len(chunk) - 1, size
+            )
+        )
+
+    def finalize(self, upload_id, content=CONTENT):
+        return self.client.post(
+            reverse('api_uploads-finalize', kwargs={'pk': upload_id}),
+            {'sha256': hashlib.sha256(content).hexdigest()}
+        )
+
+    def get_offset(self, upload_id):
+        response = self.client.get(
+            reverse('api_uploads-detail', kwargs={'pk': upload_id})
+        )
+        return json.loads(response.content.decode('utf8'))['offset']
+
+    def test_uploads_file_in_chunks_to_current_experiment(self):
+        upload_id = self.start_upload()
+        for start in range(0, len(CONTENT), 10):
+            response = self.put_chunk(upload_id, start,
+                                      CONTENT[start:start + 10])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_offset(upload_id), len(CONTENT))
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(
+            json.loads(response.content.decode('utf8'))['completed_at']
+        )
+        experiment = Experiment.objects.get(id=self.experiment.id)
+        with experiment.ethics_committee_file as file:
+            self.assertEqual(file.read(), CONTENT)
+        self.assertEqual(experiment.ethics_committee_file_name,
+                         'approval.pdf')
+        # The file was moved, not copied
+        upload = ChunkedUpload.objects.get(id=upload_id)
+        self.assertFalse(os.path.exists(partial_path(upload)))
+
+    def test_resumes_from_upload_offset(self):
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT[:10])
+        response = self.put_chunk(upload_id, 20, CONTENT[20:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            json.loads(response.content.decode('utf8'))['offset'], 10
+        )
+        offset = self.get_offset(upload_id)
+        self.put_chunk(upload_id, offset, CONTENT[offset:])
+        self.assertEqual(self.finalize(upload_id).status_code,
+                         status.HTTP_200_OK)
+
+    def test_counts_upload_bytes(self):
+        upload_id = self.start_upload()
+        uploaded = metrics.upload_bytes.values.get((), 0)
+        self.put_chunk(upload_id, 0, CONTENT[:10])
+        self.put_chunk(upload_id, 10, CONTENT[10:])
+        self.assertEqual(metrics.upload_bytes.values[()],
+                         uploaded + len(CONTENT))
+
+    def test_rejects_chunks_past_upload_size(self):
+        upload_id = self.start_upload(size=5)
+        response = self.put_chunk(upload_id, 0, CONTENT, size=5)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_offset(upload_id), 0)
+
+    def test_rejects_chunks_without_content_range(self):
+        upload_id = self.start_upload()
+        response = self.client.put(
+            reverse('api_uploads-chunk', kwargs={'pk': upload_id}), CONTENT,
+            content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_chunks_without_body(self):
+        upload_id = self.start_upload()
+        response = self.client.put(
+            reverse('api_uploads-chunk', kwargs={'pk': upload_id}), b'',
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes 0-9/%d' % len(CONTENT)
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_offset(upload_id), 0)
+
+    def test_rejects_content_range_of_another_size(self):
+        upload_id = self.start_upload()
+        response = self.put_chunk(upload_id, 0, CONTENT[:10],
+                                  size=len(CONTENT) + 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_offset(upload_id), 0)
+
+    def test_finalize_attaches_file_to_version_added_during_upload(self):
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT)
+        new_version = create_experiment(nes_id=1, owner=self.owner,
+                                        version=3)
+        self.assertEqual(self.finalize(upload_id).status_code,
+                         status.HTTP_200_OK)
+        self.assertTrue(
+            Experiment.objects.get(id=new_version.id).ethics_committee_file
+        )
+        self.assertFalse(
+            Experiment.objects.get(id=self.experiment.id)
+            .ethics_committee_file
+        )
+        self.assertEqual(ChunkedUpload.objects.get(id=upload_id).experiment,
+                         new_version)
+
+    def test_finalize_checks_size_and_checksum(self):
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, CONTENT[:10])
+        self.assertEqual(self.finalize(upload_id).status_code,
+                         status.HTTP_409_CONFLICT)
+        self.put_chunk(upload_id, 10, CONTENT[10:])
+        self.assertEqual(self.finalize(upload_id, b'other').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Experiment.objects.get(id=self.experiment.id)
+            .ethics_committee_file
+        )
+
+    def test_rejects_unknown_experiments_and_large_files(self):
+        for data in ({'experiment': 2, 'size': 10},
+                     {'experiment': 1, 'size': 10 ** 12}):
+            data['filename'] = 'approval.pdf'
+            response = self.client.post(self.list_url, data)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_uploads_are_private_to_their_owners(self):
+        upload_id = self.start_upload()
+        User.objects.create_user(username='lab2', password='nep-lab2')
+        self.client.login(username='lab2', password='nep-lab2')
+        response = self.put_chunk(upload_id, 0, CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_upload_removes_partial_file(self):
+        upload_id = self.start_upload()
+        path = partial_path(ChunkedUpload.objects.get(id=upload_id))
+        self.assertTrue(os.path.exists(path))
+        self.client.delete(
+            reverse('api_uploads-detail', kwargs={'pk': upload_id})
+        )
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_stale_uploads_are_deleted(self):
+        stale_id = self.start_upload()
+        fresh_id = self.start_upload()
+        ChunkedUpload.objects.filter(id=stale_id).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        call_command('delete_stale_uploads', stdout=StringIO())
+        self.assertEqual(
+            [str(upload.id) for upload in ChunkedUpload.objects.all()],
+            [fresh_id]
+        )
+
+    def test_uploading_stored_content_again_reuses_file(self):
+        names = []
+        for i in range(2):
+            upload_id = self.start_upload()
+            self.put_chunk(upload_id, 0, CONTENT)
+            self.finalize(upload_id)
+            names.append(Experiment.objects.get(
+                id=self.experiment.id
+            ).ethics_committee_file.name)
+            upload = ChunkedUpload.objects.get(id=upload_id)
+            self.assertFalse(os.path.exists(partial_path(upload)))
+        self.assertEqual(names[0], names[1])
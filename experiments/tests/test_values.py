@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from experiments import api
+from experiments.models import Experiment, ProtocolComponent, Group
+from experiments.tests.test_api import create_experiment
+from experiments.values import ValuesSerializer
+
+LIST_URLS = ('api_researchers-list', 'api_studies-list',
+             'api_experiments-list', 'api_protocol_components-list')
+
+
+# Responses compared are built, not read from the response cache
+@override_settings(NEP_RESPONSE_CACHE_TIMEOUT=0)
+class ValuesListTest(APITestCase):
+    """
+    Lists serialized from values rows must be the same bytes as lists
+    serialized by the serializers.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        for username in ('lab1', 'lab2'):
+            owner = User.objects.create_user(username=username)
+            for nes_id in (1, 3):
+                for version in (1, 2):
+                    experiment = create_experiment(nes_id, owner, version)
+                    for component in range(version):
+                        ProtocolComponent.objects.create(
+                            identification='Ação %d' % component,
+                            component_type='type', nes_id=component,
+                            experiment=experiment, owner=owner
+                        )
+                    Group.objects.create(title='Group', description='',
+                                         experiment=experiment,
+                                         nes_id=nes_id, owner=owner)
+        experiment = Experiment.objects.first()
+        experiment.ethics_committee_file.save('approval.pdf',
+                                              ContentFile(b'%PDF-1.4'))
+        # Status ids may not exist (see ExperimentViewSet.get_queryset)
+        Experiment.objects.filter(id=experiment.id).update(status=999)
+
+    def assert_same_content(self, url, data=None, **headers):
+        with override_settings(NEP_VALUES_LISTS=False):
+            expected = self.client.get(url, data, **headers)
+        response = self.client.get(url, data, **headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        if response.streaming:
+            self.assertEqual(b''.join(response.streaming_content),
+                             b''.join(expected.streaming_content))
+        else:
+            self.assertEqual(response.content, expected.content)
+
+    def test_lists_are_the_same(self):
+        for name in LIST_URLS:
+            with self.subTest(name):
+                url = reverse(name)
+                self.assert_same_content(url)
+                self.assert_same_content(url, {'page': 2, 'page_size': 3})
+                self.assert_same_content(url, {'ordering': '-nes_id'})
+                self.assert_same_content(url, {'stream': 1})
+                self.assert_same_content(url,
+                                         HTTP_ACCEPT='application/x-ndjson')
+        self.assert_same_content(reverse('api_groups-list',
+                                         kwargs={'nes_id': 1}))
+
+    def test_filtered_lists_and_fieldsets_are_the_same(self):
+        url = reverse('api_experiments-list')
+        self.assert_same_content(url, {'owner': 'lab2',
+                                       'current_only': 'true'})
+        self.assert_same_content(url, {'fields': 'id,status,study'})
+        self.assert_same_content(url, {'expand': 'study'})
+        self.assert_same_content(reverse('api_protocol_components-list'),
+                                 {'current_only': 'true',
+                                  'fields': 'experiment,owner'})
+
+    def test_compiles_api_serializers(self):
+        for serializer in (api.ExperimentSerializer(),
+                           api.StudySerializer(),
+                           api.ResearcherSerializer(),
+                           api.ProtocolComponentSerializer(),
+                           api.GroupSerializer()):
+            self.assertIsNotNone(ValuesSerializer.compile(serializer))
+        # Nested serializers are left to serializers
+        self.assertIsNone(ValuesSerializer.compile(
+            api.ExperimentSerializer(expand=['study'])
+        ))
+
+    def test_lists_take_as_many_queries(self):
+        url = reverse('api_experiments-list')
+        # Rows, protocol components and statuses
+        with self.assertNumQueries(3 + 1):  # +1: ETag generations
+            self.client.get(url)
@@ -0,0 +1,69 @@
+import reversion
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from reversion.models import Revision, Version
+
+from experiments.models import Experiment, ProtocolComponent
+from experiments.tests.test_api import create_experiment
+from experiments.versioning import register_models
+
+
+class VersioningAPITest(APITestCase):
+
+    def setUp(self):
+        # Restore the strategies of settings
+        self.addCleanup(register_models)
+        self.owner = User.objects.create_user(username='lab1',
+                                              password='nep-lab1')
+        create_experiment(nes_id=1, owner=self.owner, version=1)
+        ProtocolComponent.objects.create(
+            identification='An identification', component_type='A type',
+            nes_id=1, experiment=Experiment.objects.get(), owner=self.owner
+        )
+        self.client.login(username=self.owner.username, password='nep-lab1')
+
+    def patch(self, identification):
+        response = self.client.patch(
+            reverse('api_protocol_components-detail', kwargs={'nes_id': 1}),
+            {'identification': identification, 'experiment': 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def versions(self):
+        return Version.objects.filter(
+            content_type=ContentType.objects.get_for_model(ProtocolComponent)
+        ).count()
+
+    def test_changes_strategy_snapshots_changes_only(self):
+        register_models({'experiments.ProtocolComponent': 'changes'})
+        self.patch('Changed identification')
+        self.assertEqual(self.versions(), 1)
+        self.patch('Changed identification')
+        self.assertEqual(self.versions(), 1)
+        self.patch('Other identification')
+        self.assertEqual(self.versions(), 2)
+
+    def test_full_strategy_snapshots_every_save(self):
+        register_models({'experiments.ProtocolComponent': 'full'})
+        self.patch('Changed identification')
+        self.patch('Changed identification')
+        self.assertEqual(self.versions(), 2)
+
+    def test_natively_versioned_models_are_not_snapshotted(self):
+        self.assertFalse(reversion.is_registered(Experiment))
+        self.patch('Changed identification')
+        self.assertEqual(self.versions(), 0)
+        self.assertFalse(Revision.objects.exists())
+
+    def test_revisions_record_request_user(self):
+        register_models({'experiments.ProtocolComponent': 'full'})
+        self.patch('Changed identification')
+        self.assertEqual(Revision.objects.get().user, self.owner)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ImproperlyConfigured):
+            register_models({'experiments.ProtocolComponent': 'diff'})
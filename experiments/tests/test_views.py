@@ -1,4 +1,24 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+
+from experiments.tests.test_models import create_study
+from experiments.models import Experiment, ExperimentStatus, Group
+from experiments.views import get_current_experiments
+
+
+def create_experiment_versions(nes_id, owner, versions):
+    """
+    Creates experiment model objects with the same nes_id and owner,
+    one for each version number in versions.
+    """
+    study = create_study(nes_id=nes_id, owner=owner)
+    status = ExperimentStatus.objects.create(tag='to_be_approved')
+    return [
+        Experiment.objects.create(
+            nes_id=nes_id, title='Title', description='Description',
+            study=study, owner=owner, status=status, version=version
+        ) for version in versions
+    ]
 
 
 class HomePageTest(TestCase):
@@ -6,3 +26,53 @@ class HomePageTest(TestCase):
     def test_uses_home_template(self):
         response = self.client.get('/')
         self.assertTemplateUsed(response, 'experiments/home.html')
+
+    def test_displays_number_of_groups_of_current_experiments(self):
+        owner = User.objects.create_user(username='lab1')
+        experiment_v1, experiment_v2 = create_experiment_versions(
+            1, owner, [1, 2]
+        )
+        Group.objects.create(title='A', description='A', nes_id=1,
+                             experiment=experiment_v1, owner=owner)
+        for nes_id in range(1, 4):
+            Group.objects.create(title='B', description='B', nes_id=nes_id,
+                                 experiment=experiment_v2, owner=owner)
+        response = self.client.get('/')
+        self.assertEqual(
+            [experiment.group_count
+             for experiment in response.context['experiments']],
+            [3]
+        )
+
+    def test_number_of_queries_does_not_depend_on_number_of_experiments(
+            self):
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in range(1, 11):
+            experiment, = create_experiment_versions(nes_id, owner, [1])
+            Group.objects.create(title='A', description='A', nes_id=1,
+                                 experiment=experiment, owner=owner)
+        # ETag and experiments
+        with self.assertNumQueries(2):
+            response = self.client.get('/')
+        self.assertContains(response, '<td>Title</td>', count=10)
+
+
+class GetCurrentExperimentsTest(TestCase):
+
+    def test_returns_last_version_of_each_experiment(self):
+        owner1 = User.objects.create_user(username='lab1')
+        owner2 = User.objects.create_user(username='lab2')
+        exps1 = create_experiment_versions(1, owner1, [1, 2, 3])
+        exps2 = create_experiment_versions(2, owner1, [1])
+        # Same nes_id as the first experiment, but other owner
+        exps3 = create_experiment_versions(1, owner2, [1, 2])
+        self.assertEqual(
+            set(get_current_experiments()), {exps1[2], exps2[0], exps3[1]}
+        )
+
+    def test_uses_one_query_whatever_the_number_of_experiments(self):
+        owner = User.objects.create_user(username='lab1')
+        for nes_id in range(1, 21):
+            create_experiment_versions(nes_id, owner, [1, 2])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_current_experiments()), 20)
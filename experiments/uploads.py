@@ -0,0 +1,169 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from experiments import metrics
+from experiments.models import ChunkedUpload, Experiment
+
+# Directory, under MEDIA_ROOT, of files being uploaded
+PARTIAL_UPLOADS_DIR = 'partial_uploads'
+# Size of blocks copied from requests to files, and read when hashing
+BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class UploadError(Exception):
+    """
+    Chunk or upload rejected. Conflicts are chunks not starting where the
+    upload stopped: clients resume from the upload offset.
+    """
+
+    def __init__(self, message, conflict=False):
+        super().__init__(message)
+        self.conflict = conflict
+
+
+class PartialFile(File):
+    """
+    Complete upload file. Having a temporary file path, storages move it
+    to its final place instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def partial_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, PARTIAL_UPLOADS_DIR,
+                        str(upload.id))
+
+
+def create_partial_file(upload):
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+
+def parse_content_range(header, size):
+    """
+    :param header: Content-Range header value, like "bytes 0-1023/4096"
+    :param size: size of the upload, that the complete length in header
+    (if not *) must be
+    :return: tuple (first byte position, number of bytes)
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError(
+            'Content-Range header required, as "bytes <first>-<last>/<size>"'
+        )
+    first, last = int(match.group(1)), int(match.group(2))
+    if last < first:
+        raise UploadError('Invalid Content-Range.')
+    if match.group(3) != '*' and int(match.group(3)) != size:
+        raise UploadError('Content-Range size must be the upload size '
+                          '(%d bytes).' % size)
+    return first, last - first + 1
+
+
+def append_chunk(upload, stream, start, length):
+    """
+    Writes length bytes read from stream to the upload file, from start.
+    Bytes are copied in blocks, so whole chunks are never held in memory.
+    :param stream: file-like object, like the request, or None for
+    requests without body
+    :return: the upload, with its new offset
+    """
+    if upload.completed_at:
+        raise UploadError('Upload already completed.', conflict=True)
+    if stream is None:
+        raise UploadError('Chunk incomplete: 0 of %d bytes received.' %
+                          length)
+    if start != upload.offset:
+        raise UploadError('Chunk must start at byte %d.' % upload.offset,
+                          conflict=True)
+    if start + length > upload.size:
+        raise UploadError('Chunk ends after upload size (%d bytes).' %
+                          upload.size)
+    written = 0
+    with open(partial_path(upload), 'r+b') as file:
+        file.seek(start)
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            file.write(block)
+            written += len(block)
+        if written < length:
+            # Keep what was received before the client went away
+            file.truncate(start + written)
+    metrics.upload_bytes.inc(written)
+    # A concurrent request may have appended the same chunk: only one of
+    # them moves the offset
+    updated = ChunkedUpload.objects.filter(
+        pk=upload.pk, offset=start, completed_at__isnull=True
+    ).update(offset=start + written, updated_at=timezone.now())
+    if not updated:
+        upload.refresh_from_db()
+        raise UploadError('Chunk must start at byte %d.' % upload.offset,
+                          conflict=True)
+    upload.offset = start + written
+    if written < length:
+        raise UploadError('Chunk incomplete: %d of %d bytes received.' % (
+            written, length
+        ))
+    return upload
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finalize(upload, sha256):
+    """
+    Checks that the upload is complete and has the sha256 checksum, then
+    attaches its file as ethics committee file to the current version of
+    the upload experiment, that may have been added since the upload
+    started.
+    """
+    if upload.completed_at:
+        raise UploadError('Upload already completed.', conflict=True)
+    if upload.offset != upload.size:
+        raise UploadError('Upload incomplete: %d of %d bytes received.' % (
+            upload.offset, upload.size
+        ), conflict=True)
+    path = partial_path(upload)
+    if file_sha256(path) != sha256.lower():
+        raise UploadError('Checksum mismatch.')
+    with transaction.atomic(), open(path, 'rb') as file:
+        experiment = Experiment.objects.current().select_for_update().filter(
+            nes_id=upload.experiment.nes_id, owner_id=upload.owner_id
+        ).first()
+        if experiment is None:
+            raise UploadError('Experiment not found.')
+        experiment.ethics_committee_file.save(
+            upload.filename, PartialFile(file), save=False
+        )
+        experiment.save()
+        upload.experiment = experiment
+        upload.completed_at = timezone.now()
+        upload.save()
+    if os.path.exists(path):
+        # The storage had the file already
+        os.remove(path)
+    return upload
+
+
+def delete_upload(upload):
+    if os.path.exists(partial_path(upload)):
+        os.remove(partial_path(upload))
+    upload.delete()
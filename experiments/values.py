@@ -0,0 +1,281 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from experiments.instrumentation import timer
+
+# Serializer fields returning database values as they are
+IDENTITY_FIELDS = (serializers.ReadOnlyField, serializers.CharField,
+                   serializers.EmailField, serializers.IntegerField)
+
+
+class ValuesSerializer:
+    """
+    Serializes rows fetched with queryset.values() like serializer
+    serializes model objects, without building model objects nor calling
+    serializer fields' get_attribute for each row. Fields read through
+    "to one" relations are joined in the values query, and "to many"
+    primary key fields are fetched with one query per relation, as
+    optimize_queryset does.
+    Build instances with compile, that returns None for serializers with
+    fields this can't serialize (nested serializers, callables, nullable
+    relations...): those are serialized by serializer.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        # Columns fetched with values()
+        self.columns = ['pk']
+        # (field name, column, converter) tuples, in serializer order.
+        # Fields fetched with queries of their own have no column.
+        self.fields = []
+        # (field name, related model field) tuples of "to many" fields
+        self.many_fields = []
+        # Relations fetched with queries of their own, by their attname
+        self.prefetched = OrderedDict()
+
+    @classmethod
+    def compile(cls, serializer, prefetch=()):
+        """
+        :param serializer: ModelSerializer instance
+        :param prefetch: "to one" relations to be fetched with a query of
+        their own instead of joined, like in optimize_queryset
+        :return: ValuesSerializer instance, or None
+        """
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        values_serializer = cls(serializer.Meta.model)
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if not values_serializer.add_field(field, prefetch):
+                return None
+        return values_serializer
+
+    def add_field(self, field, prefetch):
+        """
+        :return: whether field can be serialized from values rows
+        """
+        if isinstance(field, serializers.BaseSerializer) or \
+                field.source == '*' or field.default is not \
+                serializers.empty:
+            return False
+        model_fields = self.follow(field.source_attrs)
+        if model_fields is None:
+            return False
+        model_field = model_fields[-1]
+        if isinstance(field, ManyRelatedField):
+            if len(model_fields) != 1 or not model_field.one_to_many or \
+                    not _serializes_pk_only(field.child_relation):
+                return False
+            self.many_fields.append((field.field_name, model_field))
+            self.fields.append((field.field_name, None, None))
+            return True
+        if model_field.is_relation:
+            # Primary key related field, read from the foreign key column
+            if len(model_fields) != 1 or not isinstance(field, RelatedField) \
+                    or not _serializes_pk_only(field):
+                return False
+            self.add_column(model_field.attname)
+            self.fields.append((field.field_name, model_field.attname, None))
+            return True
+        if len(model_fields) > 1 and model_fields[0].name in prefetch:
+            if len(model_fields) != 2:
+                return False
+            relation = model_fields[0]
+            self.prefetched.setdefault(relation.attname, (relation, []))
+            self.prefetched[relation.attname][1].append(
+                (field.field_name, model_field.attname,
+                 self.converter(field, model_field))
+            )
+            self.add_column(relation.attname)
+            self.fields.append((field.field_name, None, None))
+            return True
+        if model_field.primary_key and len(model_fields) == 1:
+            column = 'pk'
+        else:
+            column = '__'.join(field.source_attrs)
+        self.add_column(column)
+        self.fields.append((field.field_name, column,
+                            self.converter(field, model_field)))
+        return True
+
+    def add_column(self, column):
+        if column not in self.columns:
+            self.columns.append(column)
+
+    def follow(self, source_attrs):
+        """
+        :return: list of the model fields named by source_attrs, followed
+        through non nullable "to one" relations, or None if source_attrs
+        don't name a model field that way
+        """
+        model, model_fields = self.model, []
+        for position, attr in enumerate(source_attrs):
+            if model is None:
+                return None
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            last = position == len(source_attrs) - 1
+            if model_field.is_relation:
+                many = model_field.one_to_many or model_field.many_to_many
+                if (many or model_field.null) and not last:
+                    return None
+                model = model_field.related_model
+            elif not model_field.concrete or not last:
+                return None
+            model_fields.append(model_field)
+        return model_fields
+
+    @staticmethod
+    def converter(field, model_field):
+        """
+        :return: function giving the field representation of database
+        values, or None for values represented as they are
+        """
+        if type(field) in IDENTITY_FIELDS:
+            return None
+        if isinstance(field, serializers.FileField):
+            # Serializer file fields represent files, not their names
+            return lambda name: field.to_representation(
+                FieldFile(None, model_field, name)
+            )
+        return field.to_representation
+
+    def values(self, queryset):
+        """
+        :return: queryset of the rows to be serialized. Rows have the
+        columns queryset is ordered by too, that cursor pagination reads.
+        """
+        columns = list(self.columns)
+        for ordering in queryset.query.order_by:
+            if isinstance(ordering, str) and \
+                    ordering.lstrip('-') not in columns:
+                columns.append(ordering.lstrip('-'))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows):
+        """
+        :param rows: dicts from the values queryset
+        :return: list of serialized objects
+        """
+        rows = list(rows)
+        extra = {}
+        for name, model_field in self.many_fields:
+            extra[name] = self.fetch_many(model_field, rows)
+        for attname, (relation, fields) in self.prefetched.items():
+            extra.update(self.fetch_related(relation, fields, rows))
+        data = []
+        for row in rows:
+            item = OrderedDict()
+            for name, column, converter in self.fields:
+                if column is None:
+                    value = extra[name](row)
+                else:
+                    value = row[column]
+                    if converter is not None and value is not None:
+                        value = converter(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    @staticmethod
+    def fetch_many(model_field, rows):
+        """
+        Fetches the primary keys of objects related to rows by the reverse
+        foreign key model_field, in one query.
+        :return: function giving the primary keys related to a row
+        """
+        foreign_key = model_field.field
+        related_pks = OrderedDict((row['pk'], []) for row in rows)
+        if related_pks:
+            related = model_field.related_model._default_manager.filter(**{
+                foreign_key.name + '__in': list(related_pks)
+            }).values_list(foreign_key.attname, 'pk')
+            for pk, related_pk in related:
+                related_pks[pk].append(related_pk)
+        return lambda row: related_pks[row['pk']]
+
+    @staticmethod
+    def fetch_related(relation, fields, rows):
+        """
+        Fetches the fields of objects related to rows by the foreign key
+        relation, in one query. Missing objects give None values.
+        :return: dict mapping field names to functions giving their value
+        for a row
+        """
+        related_ids = {row[relation.attname] for row in rows}
+        related = {}
+        if related_ids:
+            for values in relation.related_model._default_manager.filter(
+                    pk__in=related_ids
+            ).values('pk', *[attname for _, attname, _ in fields]):
+                related[values['pk']] = values
+
+        def getter(attname, converter):
+            def get(row):
+                value = related.get(row[relation.attname], {}).get(attname)
+                if converter is not None and value is not None:
+                    value = converter(value)
+                return value
+            return get
+
+        return {name: getter(attname, converter)
+                for name, attname, converter in fields}
+
+
+class SerializedRows:
+    """
+    Stands for the list serializer of rows: data is serialized by
+    values_serializer.
+    """
+
+    def __init__(self, values_serializer, rows):
+        self.values_serializer = values_serializer
+        self.rows = rows
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return ReturnList(self.values_serializer.serialize(self.rows),
+                              serializer=self)
+
+
+class ValuesListMixin:
+    """
+    Lists objects from values rows serialized by ValuesSerializer, when
+    the serializer can be compiled and settings.NEP_VALUES_LISTS is set.
+    The JSON is the same as the serializer's. Relations the queryset
+    prefetches instead of joining are fetched with queries of their own.
+    """
+    values_serializer = None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list' or not settings.NEP_VALUES_LISTS:
+            return queryset
+        prefetch = [lookup for lookup in queryset._prefetch_related_lookups
+                    if isinstance(lookup, str)]
+        self.values_serializer = ValuesSerializer.compile(
+            self.get_serializer(), prefetch
+        )
+        if self.values_serializer is None:
+            return queryset
+        return self.values_serializer.values(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.values_serializer is not None and kwargs.get('many'):
+            return SerializedRows(self.values_serializer, args[0])
+        return super().get_serializer(*args, **kwargs)
+
+
+def _serializes_pk_only(field):
+    return hasattr(field, 'use_pk_only_optimization') and \
+        field.use_pk_only_optimization() and field.pk_field is None
@@ -0,0 +1,65 @@
+import reversion
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+
+# Versioning strategies of models (see settings.NEP_VERSIONING)
+# Every save is snapshotted by django-reversion
+FULL = 'full'
+# Saves are snapshotted only when they change the versioned fields
+CHANGES = 'changes'
+# Saves are not snapshotted: the model keeps its versions itself, like
+# Experiment with its version column
+NATIVE = 'native'
+STRATEGIES = (FULL, CHANGES, NATIVE)
+
+# Fields the application keeps up to date, left out of snapshots of the
+# changes strategy: they would make every save a change
+BOOKKEEPING_FIELDS = ('updated_at', 'is_current')
+
+
+def register_models(strategies=None):
+    """
+    Registers models with django-reversion, or unregisters them, following
+    their versioning strategy.
+    :param strategies: dict mapping model labels to strategies, defaults to
+    settings.NEP_VERSIONING
+    """
+    if strategies is None:
+        strategies = settings.NEP_VERSIONING
+    for label, strategy in strategies.items():
+        if strategy not in STRATEGIES:
+            raise ImproperlyConfigured(
+                'Unknown versioning strategy %r for %s.' % (strategy, label)
+            )
+        model = apps.get_model(label)
+        if reversion.is_registered(model):
+            reversion.unregister(model)
+        if strategy == FULL:
+            reversion.register(model)
+        elif strategy == CHANGES:
+            reversion.register(model, exclude=BOOKKEEPING_FIELDS,
+                               ignore_duplicates=True)
+
+
+class RevisionMixin:
+    """
+    Snapshots the objects of registered models saved by write requests.
+    The snapshots of a request share one revision, recording the user,
+    saved when the request ends. Objects created with bulk_create are not
+    snapshotted: save signals are not sent for them.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        # Writes run in their own transactions: not wrapping whole requests
+        # in one keeps write locks short
+        with reversion.create_revision(atomic=False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if reversion.is_active() and request.user.is_authenticated:
+            reversion.set_user(request.user)
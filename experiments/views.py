@@ -1,23 +1,50 @@
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
-from django.db.models import Max, Q
 
-from experiments.models import Experiment
+from experiments import metrics as registry
+from experiments.caching import cache_anonymous_response
+from experiments.models import Experiment, Group, Study, ProtocolComponent
 
+# Models whose rows are counted by the metrics view
+COUNTED_MODELS = (Experiment, Study, ProtocolComponent, Group)
 
+
+@cache_anonymous_response(Experiment, Group)
 def home_page(request):
-    experiments = get_current_experiments()
+    experiments = get_current_experiments().with_group_count()
 
     return render(request, 'experiments/home.html',
                   {'experiments': experiments})
 
 
 def get_current_experiments():
-    experiment_max_version_set = \
-        Experiment.objects.values('owner', 'nes_id').annotate(
-            max_version=Max('version'))
-    q_statement = Q()
-    for experiment in experiment_max_version_set:
-        q_statement |= (Q(owner=experiment['owner']) &
-                        Q(nes_id=experiment['nes_id']) &
-                        Q(version=experiment['max_version']))
-    return Experiment.objects.filter(q_statement)
+    return Experiment.objects.current()
+
+
+def metrics(request):
+    """
+    Exports the metrics of this process (see experiments.metrics) in the
+    Prometheus text format, when settings.NEP_METRICS is set.
+    """
+    if not settings.NEP_METRICS:
+        raise Http404
+    for model, count in zip(COUNTED_MODELS, count_rows(COUNTED_MODELS)):
+        registry.rows.set(count, model=model._meta.model_name)
+    return HttpResponse(registry.REGISTRY.render(),
+                        content_type=registry.CONTENT_TYPE)
+
+
+def count_rows(models):
+    """
+    :return: list of the numbers of rows of models, counted with a single
+    query
+    """
+    tables = [connection.ops.quote_name(model._meta.db_table)
+              for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(
+            '(SELECT COUNT(*) FROM %s)' % table for table in tables
+        ))
+        return list(cursor.fetchone())
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Measures requests when NEP_INSTRUMENTATION or NEP_METRICS is set
+    'experiments.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +87,93 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+# LocMemCache is private to each process: when the site is served by several
+# processes, each one caches its own copy of responses. A cache they share
+# (memcached, redis) saves memory and builds each response once.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nep',
+    }
+}
+
+# Cache used for responses to anonymous reads of the API and home page, and
+# their timeout in seconds (0 disables it). Cached responses are invalidated
+# when the rows they were built from change (see experiments.caching): their
+# keys include generations kept in the database, so processes with their
+# own caches don't serve stale responses either.
+NEP_RESPONSE_CACHE = 'default'
+NEP_RESPONSE_CACHE_TIMEOUT = 60
+# JSON library of API responses and requests (see experiments.renderers):
+# 'orjson', 'ujson' or 'json'. None uses the fastest one installed.
+NEP_JSON_BACKEND = None
+# Serialize API lists from .values() rows instead of model objects (see
+# experiments.values). The JSON is the same, built faster.
+NEP_VALUES_LISTS = True
+# Measure requests: SQL queries and their time, serialize, render and total
+# times are sent in Server-Timing headers and logged as JSON by the
+# experiments.instrumentation logger (see the request_stats management
+# command). Measuring peak Python memory slows requests down several times.
+NEP_INSTRUMENTATION = False
+NEP_INSTRUMENTATION_MEMORY = False
+# Export request counts, latencies and queries by view action, response
+# cache hits, upload bytes and row counts at /metrics, in the Prometheus
+# text format (see experiments.metrics). Anyone can read them: restrict
+# access to /metrics in the front end web server.
+NEP_METRICS = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'instrumentation': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'experiments.instrumentation': {
+            'handlers': ['instrumentation'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Django REST framework
+# http://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # JSON is encoded and decoded with the fastest JSON library installed
+    # (see experiments.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'experiments.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'experiments.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # API views choose between page number and cursor pagination (see
+    # experiments.pagination.PaginationModeMixin)
+    'DEFAULT_PAGINATION_CLASS': 'experiments.pagination.CursorPagination',
+    'PAGE_SIZE': 100,
+    # List filters declared by API views' filter_fields, and ?ordering
+    'DEFAULT_FILTER_BACKENDS': (
+        'experiments.filtering.FieldFilterBackend',
+        'rest_framework.filters.OrderingFilter',
+    ),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
 
@@ -128,3 +217,28 @@ STATICFILES_DIRS = [
     '/home/caco/Workspace/nep-system/nep',
 ]
 MEDIA_ROOT = '/home/caco/Workspace/nep-system/nep/media'
+# Maximum size of files uploaded in chunks (see experiments.uploads)
+NEP_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+# Header delegating file downloads to the front end web server (see
+# experiments.downloads): 'X-Sendfile' (Apache mod_xsendfile, lighttpd) or
+# 'X-Accel-Redirect' (nginx). None serves files from Django.
+NEP_SENDFILE_HEADER = None
+# With X-Accel-Redirect, nginx internal location serving MEDIA_ROOT
+NEP_SENDFILE_URL = '/protected-media/'
+
+# Versioning strategy of models (see experiments.versioning): 'full'
+# snapshots every save with django-reversion, 'changes' only saves changing
+# the model fields, 'native' none, for models keeping their own versions.
+# Experiments have version rows, and their protocol components belong to
+# an experiment version. The benchmark_versioning management command
+# compares the write throughput and storage of strategies.
+NEP_VERSIONING = {
+    'experiments.Experiment': 'native',
+    'experiments.ProtocolComponent': 'native',
+}
+
+# Background jobs (see experiments.jobs), run by the run_jobs management
+# command: times jobs are attempted before failing, and seconds before the
+# first retry, doubled on each retry
+NEP_JOBS_MAX_ATTEMPTS = 3
+NEP_JOBS_RETRY_DELAY = 30
@@ -8,4 +8,5 @@ urlpatterns = [
     url(r'^admin/', admin.site.urls),
     url(r'^api-auth/', include('rest_framework.urls')),
     url(r'^api/', include(api_urls)),
+    url(r'^metrics$', views.metrics, name='metrics'),
 ]